@@ -0,0 +1,15 @@
+"""Checks and benchmarks for the lookup engine, runnable without Anki
+
+Run them from the repository root, e.g. `python -m benchmarks.edict_parser`.
+"""
+import os.path
+import sys
+import types
+
+# Importing the japanote package runs the add-on entry point, which needs a
+# running Anki. Register the package without executing its __init__ so that
+# the engine modules (japanote.edict2.*, japanote.romkan) can be imported.
+if 'japanote' not in sys.modules:
+    package = types.ModuleType('japanote')
+    package.__path__ = [os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'japanote')]
+    sys.modules['japanote'] = package
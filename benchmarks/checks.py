@@ -0,0 +1,128 @@
+"""Self-checks of the kana helpers, of furigana matching, of the table of inflected forms and of searches
+
+They used to run on every import of the add-on, and now run before the benchmark
+suite. Usage: python -m benchmarks.checks
+"""
+import os.path
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from japanote.edict2 import furigana, kanji
+from japanote.edict2.deinflect import Candidate, Deinflector
+from japanote.edict2.furigana import furigana_from_kanji_kana
+from japanote.edict2.search import Edict
+
+# a small dictionary, where a word (食べさせる) is also an inflected form of
+# another (食べる), and three words are one typo away from 'かたし'
+sample_edict = """\
+??? /EDICT2 Sample/
+食べる [たべる] /(v1,vt) to eat/EntL1358280X/
+食べさせる [たべさせる] /(v1,vt) to feed/EntL1358290X/
+見る [みる] /(v1,vt) to see/EntL1259290X/
+形(P) [かたち(P)] /(n) form/shape/(P)/EntL1250040X/
+形見(P) [かたみ(P)] /(n) memento/(P)/EntL1250080X/
+私(P) [わたし(P)] /(pn) I/me/(P)/EntL1311110X/
+"""
+
+
+@contextmanager
+def temporary_edict() -> Iterator[Edict]:
+    """Return an Edict of sample_edict, in a temporary directory along with its caches"""
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'edict2')
+        with open(filename, 'w') as f:
+            f.write(sample_edict)
+        yield Edict(filename)
+
+
+def check_kana() -> None:
+    assert furigana.hiragana_to_katakana('あ') == 'ア'
+    assert furigana.hiragana_to_katakana('っ') == 'ッ'
+    assert kanji.hiragana_to_katakana('くぼ.む') == 'クボ.ム'
+    assert kanji.katakana_to_hiragana('クボ.ム') == 'くぼ.む'
+    assert kanji.normalize_reading('くぼ.む') == 'くぼ'
+    assert kanji.normalize_reading('クボ.ム') == 'くぼ'
+    assert kanji.normalize_reading('もの-') == 'もの'
+    assert kanji.normalize_reading('-カタ') == 'かた'
+
+
+def _test(kanji: str, kana: str, expected: str) -> None:
+    """Test furigana_from_kanji_kana() against expected result"""
+    furigana = furigana_from_kanji_kana(kanji, kana)
+    if furigana != expected:
+        print(f'ERROR: furigana_from_kanji_kana({kanji!r}, {kana!r}) returns the wrong result')
+        print(f'Output:   {furigana!r}')
+        print(f'Expected: {expected!r}')
+        raise AssertionError
+
+
+def check_furigana() -> None:
+    _test('私', 'わたし', '私[わたし]')
+    _test('牛肉', 'ぎゅうにく', '牛[ぎゅう]肉[にく]')
+    _test(
+        '一二三四五六七八九十', 'いちにさんしごろくななはちきゅうじゅう',
+        '一[いち]二[に]三[さん]四[し]五[ご]六[ろく]七[なな]八[はち]九[きゅう]十[じゅう]',
+    )
+    _test('等々', 'などなど', '等[など]々[など]')
+    _test('日帰り', 'ひがえり', '日[ひ]帰[がえ]り')
+    _test('判官', 'はんがん', '判[はん]官[がん]')
+    _test('贔屓', 'ひいき', '贔[ひい]屓[き]')
+    _test('判官贔屓', 'はんがんびいき', '判[はん]官[がん]贔[びい]屓[き]')
+    _test('メッタ刺し', 'めったざし', 'メッタ 刺[ざ]し')
+    _test('文字', 'もじ', '文[も]字[じ]')
+    _test('楔形文字', 'くさびがたもじ', '楔[くさび]形[がた]文[も]字[じ]')
+    # vowels may be lengthened after characters missing from kanjidic, and after 々
+    _test('ば様', 'ばあさま', 'ば[ばあ]様[さま]')
+    _test('木々', 'ききい', '木[き]々[きい]')
+    # With the rules above, the test below could also result in:
+    # 人[ひと]を 呪[のろ]わ ば[ばあ] 穴[な]二[ふた]つ
+    # The only thing that prevents this is deterministic ordering that makes it so
+    # that lengthened readings have lower priority.
+    _test('人を呪わば穴二つ', 'ひとをのろわばあなふたつ', '人[ひと]を 呪[のろ]わば 穴[あな]二[ふた]つ')
+
+
+def check_inflection_index() -> None:
+    """Check that the table of inflected forms gives the same words as the deinflector"""
+    deinflector = Deinflector()
+    with temporary_edict() as edict:
+        index = edict.load_inflection_index(deinflector)
+        # as japanote.model.deinflect() does
+        for form in ['食べさせる', '食べさせた', 'たべさせない', '食べた', '見た', '見させた', '見て', '食べ']:
+            indexed = index.get(form)
+            candidates = deinflector(form) if indexed is None else (Candidate(form, 0xff), *indexed)
+            words = [word.kanji for word in edict.search_candidates(candidates)]
+            expected = [word.kanji for word in edict.search_candidates(deinflector(form))]
+            assert words == expected, (form, words, expected)
+        # a word of the dictionary that deinflects further keeps its deeper candidates
+        assert [candidate.word for candidate in index.get('食べさせる') or ()] == ['食べる']
+        assert [candidate.word for candidate in index.get('食べさせた') or ()] == ['食べさせる', '食べる']
+
+
+def check_search() -> None:
+    with temporary_edict() as edict:
+        assert [word.kanji for word in edict.search('かたち')] == ['形']
+        assert [word.kanji for word in edict.search_prefix('kat')] == ['形', '形見']
+        # common words come first even when their keys come last (わたし), then the others in key order
+        assert [word.kanji for word in edict.search_prefix('')] == ['形', '形見', '私', '食べさせる', '食べる', '見る']
+        assert [word.kanji for word in edict.search_wildcard('*た*')] == ['形', '形見', '私', '食べさせる', '食べる']
+        # near misses come at distance 1, whose scores are negative
+        assert [word.kanji for word in edict.search_fuzzy('かたし', 1)] == ['形', '形見', '私']
+        assert not list(edict.search_fuzzy('かたしる', 0))
+
+
+def run() -> None:
+    """Run all the checks, raising AssertionError on the first failure"""
+    check_kana()
+    check_furigana()
+    check_inflection_index()
+    check_search()
+
+
+def main() -> None:
+    run()
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
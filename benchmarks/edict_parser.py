@@ -0,0 +1,71 @@
+"""Compare the EDICT parser and key normalizer with the regex/romkan reference
+
+Every line of the dictionary must give the same word and the same keys with
+both implementations. Usage: python -m benchmarks.edict_parser [FILENAME]
+"""
+import re
+import sys
+import time
+from typing import Callable, Optional
+
+from japanote import romkan
+from japanote.edict2.search import Word, default_edict, normalize_key, parse_line
+
+# reference implementation (previously used by Edict.load)
+edict_line_pattern = re.compile(r'(?m)^(\S*) (?:\[(\S*?)\] )?/(.*)/$')
+common_marker = re.compile(r'\([^)]*\)')
+
+
+def reference_parse(line: str) -> Optional[Word]:
+    match = edict_line_pattern.match(line)
+    if not match:
+        return None
+    swritings, sreadings, glosses = match.groups()
+    writings = tuple(common_marker.sub('', swritings).split(';'))
+    readings = tuple(common_marker.sub('', sreadings).split(';')) if sreadings else ()
+    return Word(writings, readings, glosses)
+
+
+def reference_normalize(key: str) -> str:
+    return romkan.to_hiragana(romkan.to_roma(key))
+
+
+# what a line gives: its writings, readings and glosses, with its normalized keys (None when it is no entry)
+ParsedLine = Optional[tuple[tuple[str, ...], tuple[str, ...], str, set[str]]]
+
+
+def timed_keys(
+    lines: list[str], parse: Callable[[str], Optional[Word]], normalize: Callable[[str], str],
+) -> tuple[float, list[ParsedLine]]:
+    start = time.perf_counter()
+    results: list[ParsedLine] = []
+    for line in lines:
+        word = parse(line)
+        if word is None:
+            results.append(None)
+            continue
+        keys = {normalize(key) for key in word.writings + word.readings}
+        results.append((word.writings, word.readings, word.glosses, keys))
+    return time.perf_counter() - start, results
+
+
+def main() -> None:
+    filename = sys.argv[1] if len(sys.argv) > 1 else default_edict
+    with open(filename, encoding='utf-8') as f:
+        lines = f.readlines()[1:]  # skip header
+
+    reference_time, reference = timed_keys(lines, reference_parse, reference_normalize)
+    fast_time, fast = timed_keys(lines, parse_line, normalize_key)
+
+    mismatches = [line for line, a, b in zip(lines, reference, fast) if a != b]
+    for line in mismatches[:10]:
+        print(f'MISMATCH: {line!r}')
+    print(f'{len(lines)} lines, {len(mismatches)} mismatches')
+    print(f'reference: {reference_time:.2f} s')
+    print(f'fast:      {fast_time:.2f} s ({reference_time / fast_time:.1f}x)')
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Compare the furigana matcher with the breadth-first reference
+
+Every entry of the dictionary must give the same furigana with both
+implementations. Usage: python -m benchmarks.furigana [FILENAME]
+"""
+import sys
+import time
+from collections import deque
+from typing import Callable, Iterator
+
+from japanote.edict2.furigana import furigana_from_match, get_kanjidic, hiragana_to_katakana, match_from_kanji_kana
+from japanote.edict2.kanji import lengthen_vowel
+from japanote.edict2.search import Edict, default_edict
+
+# number of entries with the longest writings timed separately
+long_entries = 1000
+
+
+# reference implementation (previously used by furigana_from_kanji_kana)
+def reference_matches(kanji: str, kana: str) -> Iterator[list[tuple[str, str]]]:
+    kanjidic = get_kanjidic()
+    default = [(kanji, kana)]
+    q = deque([([], kanji, kana)])
+    while q:
+        match_prefix, kanji, kana = q.popleft()
+        if not kanji and not kana:
+            yield match_prefix
+        if not kanji or not kana:
+            continue
+        c = kanji[0]
+        if c == '々' and match_prefix:
+            readings = [match_prefix[-1][1]]
+        else:
+            try:
+                readings = list(kanjidic[c].readings)
+            except KeyError:
+                readings = [c]
+        readings.extend(filter(None, map(lengthen_vowel, readings)))
+        for reading in dict.fromkeys(readings):
+            if hiragana_to_katakana(kana[0]) == reading or kana.startswith(reading):
+                q.append((match_prefix + [(c, reading)], kanji[1:], kana[len(reading):]))
+    yield default
+
+
+def reference_match(kanji: str, kana: str) -> list[tuple[str, str]]:
+    return list(reference_matches(kanji, kana))[0]
+
+
+def timed_furigana(
+    pairs: list[tuple[str, str]], match: Callable[[str, str], list[tuple[str, str]]],
+) -> tuple[float, list[str]]:
+    start = time.perf_counter()
+    results = [furigana_from_match(match(kanji, kana)) for kanji, kana in pairs]
+    return time.perf_counter() - start, results
+
+
+def main() -> None:
+    edict = Edict(sys.argv[1] if len(sys.argv) > 1 else default_edict)
+    edict.load()
+    pairs = [(word.kanji, word.kana) for word in edict.entries]
+    get_kanjidic()
+
+    reference_time, reference = timed_furigana(pairs, reference_match)
+    fast_time, fast = timed_furigana(pairs, match_from_kanji_kana)
+    mismatches = [(pair, a, b) for pair, a, b in zip(pairs, reference, fast) if a != b]
+    for pair, a, b in mismatches[:10]:
+        print(f'MISMATCH: {pair!r}: {a!r} != {b!r}')
+    print(f'{len(pairs)} entries, {len(mismatches)} mismatches')
+    print(f'reference: {reference_time:.2f} s')
+    print(f'fast:      {fast_time:.2f} s ({reference_time / fast_time:.1f}x)')
+
+    longest = sorted(pairs, key=lambda pair: len(pair[0]), reverse=True)[:long_entries]
+    reference_time, _ = timed_furigana(longest, reference_match)
+    fast_time, _ = timed_furigana(longest, match_from_kanji_kana)
+    print(f'{len(longest)} longest entries (at least {len(longest[-1][0])} characters)')
+    print(f'reference: {reference_time:.2f} s')
+    print(f'fast:      {fast_time:.2f} s ({reference_time / fast_time:.1f}x)')
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Check that computing furigana does not get slower or use more memory over time
+
+Computes the furigana of every entry of the dictionary over and over, and
+reports the time of each round along with the size of kanjidic. The check
+fails if kanjidic grows, or if some furigana differ from those of the
+breadth-first reference implementation. Usage: python -m benchmarks.furigana_soak [FILENAME [ROUNDS]]
+"""
+import sys
+import time
+
+from benchmarks.furigana import reference_match
+from japanote.edict2.furigana import furigana_from_kanji_kana, furigana_from_match, get_kanjidic
+from japanote.edict2.memory import deep_getsizeof
+from japanote.edict2.search import Edict, default_edict
+
+
+def main() -> None:
+    edict = Edict(sys.argv[1] if len(sys.argv) > 1 else default_edict)
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    edict.load()
+    pairs = [(word.kanji, word.kana) for _, word in edict.iter_entries()]
+    kanjidic = get_kanjidic()
+    initial_size = deep_getsizeof(kanjidic)
+
+    expected = [furigana_from_match(reference_match(kanji, kana)) for kanji, kana in pairs]
+
+    times = []
+    mismatches = 0
+    for round_ in range(rounds):
+        start = time.perf_counter()
+        results = [furigana_from_kanji_kana(kanji, kana) for kanji, kana in pairs]
+        times.append(time.perf_counter() - start)
+        size = deep_getsizeof(kanjidic)
+        round_mismatches = sum(result != reference for result, reference in zip(results, expected))
+        mismatches += round_mismatches
+        print(
+            f'round {round_ + 1}: {times[-1] / len(pairs) * 1e6:.1f} us per entry, kanjidic {size / 1e6:.2f} MB, '
+            f'{round_mismatches} mismatches',
+        )
+    print(f'first round {times[0]:.2f} s, last round {times[-1]:.2f} s')
+    if size != initial_size:
+        print(f'kanjidic grew from {initial_size} to {size} bytes')
+    if mismatches:
+        print(f'{mismatches} furigana differ from the reference')
+    if size != initial_size or mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
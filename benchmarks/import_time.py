@@ -0,0 +1,56 @@
+"""Check that importing the lookup engine stays cheap
+
+Anki imports the add-on at startup, so work done at import time delays every
+start. This imports the engine modules in a fresh interpreter with
+-X importtime and fails when the time spent in japanote modules exceeds the
+budget. Usage: python -m benchmarks.import_time [BUDGET_MS]
+"""
+import os.path
+import subprocess
+import sys
+
+# time allowed for importing the japanote modules, in milliseconds
+default_budget = 30
+modules = [
+    'japanote.edict2.search',
+    'japanote.edict2.deinflect',
+    'japanote.edict2.furigana',
+    'japanote.edict2.kanji',
+    'japanote.edict2.memory',
+]
+# number of runs, keeping the fastest to reduce noise
+runs = 5
+
+
+def import_times() -> dict[str, int]:
+    """Return the time spent importing each japanote module (excluding its imports), in microseconds"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = 'import benchmarks; ' + '; '.join(f'import {module}' for module in modules)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code], cwd=root, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        if name.startswith('japanote'):
+            times[name] = int(self_time)
+    return times
+
+
+def main() -> None:
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else default_budget
+    times = min((import_times() for _ in range(runs)), key=lambda times: sum(times.values()))
+    for name, time in sorted(times.items(), key=lambda item: item[1], reverse=True):
+        print(f'{time / 1000:6.1f} ms  {name}')
+    total = sum(times.values()) / 1000
+    print(f'{total:6.1f} ms  total (budget: {budget} ms)')
+    if total > budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
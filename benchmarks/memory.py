@@ -0,0 +1,20 @@
+"""Report the memory used by the loaded dictionaries
+
+Usage: python -m benchmarks.memory [EDICT [ENAMDICT]]
+"""
+import sys
+
+from japanote.edict2.memory import memory_report
+from japanote.edict2.search import Edict, edict, enamdict
+
+
+def main() -> None:
+    dictionaries = [('edict', edict), ('enamdict', enamdict)]
+    for i, filename in enumerate(sys.argv[1:3]):
+        name, dictionary = dictionaries[i]
+        dictionaries[i] = (name, Edict(filename, lazy=dictionary.lazy))
+    print(memory_report(dictionaries))
+
+
+if __name__ == '__main__':
+    main()
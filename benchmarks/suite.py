@@ -0,0 +1,226 @@
+"""Measure the lookup engine, to compare its performance over time
+
+Loads a dictionary and times the main operations of the engine, without
+Anki. The numbers are printed, and may be saved as JSON and compared with a
+previous run, in which case the check fails if any number got worse by more
+than its tolerance. Each timing is the median of several runs. The name of
+each number gives its unit, which tells whether lower or higher is better
+(e.g. 'load_cold_s' or 'search_per_s').
+The self-checks of benchmarks.checks run first, since timing broken code is
+pointless.
+Usage: python -m benchmarks.suite [-h] [--output FILE] [--baseline FILE] [--tolerance T] [EDICT]
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os.path
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from functools import partial
+from typing import Callable, Optional, Sequence
+
+from benchmarks import checks
+from japanote import romkan
+from japanote.edict2.deinflect import Deinflector
+from japanote.edict2.furigana import furigana_from_kanji_kana, get_kanjidic
+from japanote.edict2.memory import deep_getsizeof
+from japanote.edict2.search import Edict, Word, default_edict
+
+# size of the samples of entries and forms, drawn with a fixed seed so that runs are comparable
+sample_size = 2000
+seed = 0
+# number of runs of each timing, keeping the median to reduce noise
+runs = 5
+# number of loads without cache, each parsing the dictionary (which takes seconds)
+cold_runs = 3
+# relative change above which a number is reported as a regression
+default_tolerance = 0.2
+# noisier numbers get more slack, while sizes barely vary between runs
+tolerances = {
+    'load_cold_s': 0.3,
+    'load_warm_s': 0.3,
+    'load_lazy_warm_s': 0.3,
+    'furigana_p99_us': 0.5,
+    'index_mb': 0.05,
+    'peak_memory_mb': 0.1,
+}
+
+Results = dict[str, float]
+
+
+def median_time(function: Callable[[], object], count: int = runs) -> float:
+    """Return the median time of count runs of function, in seconds"""
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def bench_load(filename: str, results: Results) -> Edict:
+    """Time loading the dictionary without cache (parsing it) and with cache, and return it loaded"""
+    with tempfile.TemporaryDirectory() as directory:
+        # the cache is written next to the dictionary, so work on a copy
+        copy = os.path.join(directory, os.path.basename(filename))
+        shutil.copy(filename, copy)
+        cache = Edict(copy).cache_filename()
+
+        def load_cold() -> None:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(cache)
+            Edict(copy).load()
+
+        results['load_cold_s'] = median_time(load_cold, cold_runs)
+        results['load_warm_s'] = median_time(lambda: Edict(copy).load())
+        Edict(copy, lazy=True).load()  # build the cache of the lazy index
+        results['load_lazy_warm_s'] = median_time(lambda: Edict(copy, lazy=True).load())
+        edict = Edict(copy)
+        edict.load()
+    results['index_mb'] = deep_getsizeof(edict) / 1e6
+    return edict
+
+
+def bench_search(edict: Edict, entries: Sequence[Word], results: Results) -> None:
+    keys = [word.kana for word in entries] + [word.kanji for word in entries]
+    prefixes = [word.kana[:2] for word in entries]
+
+    def search() -> None:
+        for key in keys:
+            list(edict.search(key))
+
+    def search_prefix() -> None:
+        for prefix in prefixes:
+            list(edict.search_prefix(prefix, 200))
+
+    results['search_per_s'] = len(keys) / median_time(search)
+    results['search_prefix_per_s'] = len(prefixes) / median_time(search_prefix)
+
+
+def bench_deinflect(entries: Sequence[Word], results: Results) -> None:
+    deinflector = Deinflector()
+    forms = sorted({
+        form
+        for word in entries
+        for writing in (word.kanji, word.kana)
+        for form, _ in deinflector.inflect(writing, word.type_, 1)
+    })
+    candidates = 0
+
+    def deinflect() -> None:
+        nonlocal candidates
+        deinflector.deinflect.cache_clear()  # time the search rather than its memoization
+        candidates = sum(len(deinflector(form)) for form in forms)
+
+    elapsed = median_time(deinflect)
+    results['deinflect_words_per_s'] = len(forms) / elapsed
+    results['deinflect_candidates_per_s'] = candidates / elapsed
+
+
+def bench_furigana(entries: Sequence[Word], results: Results) -> None:
+    get_kanjidic()
+    pairs = [(word.kanji, word.kana) for word in entries if word.kanji != word.kana]
+    latencies = []
+    for kanji, kana in pairs:
+        latencies.append(median_time(partial(furigana_from_kanji_kana, kanji, kana)))
+    latencies.sort()
+    results['furigana_mean_us'] = sum(latencies) / len(latencies) * 1e6
+    results['furigana_p99_us'] = latencies[len(latencies) * 99 // 100] * 1e6
+
+
+def bench_romkan(entries: Sequence[Word], results: Results) -> None:
+    romaji = [romkan.to_roma(word.kana) for word in entries]
+
+    def convert() -> None:
+        for text in romaji:
+            romkan.to_hiragana(text)
+
+    results['romkan_per_s'] = len(romaji) / median_time(convert)
+
+
+def peak_memory_mb() -> float:
+    """Return the peak resident memory of the process (0 where unavailable)"""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def run(filename: str) -> Results:
+    results: Results = {}
+    edict = bench_load(filename, results)
+    # objects of the loaded dictionary live until the end, so keep the
+    # garbage collector from scanning them during the timings
+    gc.collect()
+    gc.freeze()
+    entries = [word for _, word in edict.iter_entries() if word.readings]
+    entries = random.Random(seed).sample(entries, min(sample_size, len(entries)))
+    bench_search(edict, entries, results)
+    bench_deinflect(entries, results)
+    bench_furigana(entries, results)
+    bench_romkan(entries, results)
+    results['peak_memory_mb'] = peak_memory_mb()
+    return results
+
+
+def regressions(results: Results, baseline: Results, tolerance: Optional[float] = None) -> list[str]:
+    """Return a description of the numbers that got worse than in baseline by more than their tolerance
+
+    The tolerance of each number is given by tolerances (default_tolerance if
+    missing), unless tolerance is given for all of them."""
+    found = []
+    for name, value in results.items():
+        previous = baseline.get(name)
+        if not previous or not value:
+            continue
+        # rates are better when higher, times and sizes when lower
+        change = previous / value - 1 if name.endswith('_per_s') else value / previous - 1
+        if change > (tolerance if tolerance is not None else tolerances.get(name, default_tolerance)):
+            found.append(f'{name}: {previous:.4g} -> {value:.4g} ({change:.0%} worse)')
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure the lookup engine')
+    parser.add_argument('edict', nargs='?', default=default_edict, help='dictionary file (EDICT2 format)')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare the results with this JSON file from an earlier run')
+    parser.add_argument('--tolerance', type=float, help='relative change allowed (default: depends on the number)')
+    args = parser.parse_args()
+
+    checks.run()
+    report = {
+        'dictionary': os.path.basename(args.edict),
+        'dictionary_size': os.path.getsize(args.edict),
+        'python': platform.python_version(),
+        'results': run(args.edict),
+    }
+    for name, value in report['results'].items():
+        print(f'{name:28} {value:12.4g}')
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['dictionary_size'] != report['dictionary_size']:
+            print('warning: the baseline was measured with another dictionary')
+        found = regressions(report['results'], baseline['results'], args.tolerance)
+        for line in found:
+            print(f'regression: {line}')
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,18 @@
+from concurrent.futures import Future
 from typing import Callable, TypeVar
 
 from anki.hooks import wrap
-from aqt import mw
+from aqt import gui_hooks, mw
 from aqt.deckbrowser import DeckBrowser
 from aqt.qt import QObject, pyqtSlot
-from aqt.utils import showInfo
+from aqt.utils import showInfo, tooltip
 
-from .model import add_notes, word_search
+from .bulkaddwindow import BulkAddWindow
+from .model import add_notes, dictionaries_ready, get_word_search, preload
 from .searchwindow import SearchWindow
 from .settingswindow import SettingsWindow
 from .view import refresh_deckBrowser
 
-
 T = TypeVar('T')
 
 
@@ -19,29 +20,46 @@ class JavaScriptBridge(QObject):
     @pyqtSlot(str, result=bool)
     @pyqtSlot(str, bool, result=bool)
     def quickAdd(self, pattern: str, is_proper_noun: bool = False) -> bool:
+        """Start looking up pattern, and return whether the search was started
+
+        The search runs in the background; the form is cleared once its results
+        are used."""
         pattern = pattern.strip()
         if not pattern:
             return False
+        if not dictionaries_ready.is_set():
+            tooltip('JapaNote: waiting for dictionaries to load…')
+        word_search = get_word_search()
         word_search.is_proper_noun = is_proper_noun
-        word_search.search(pattern)
-        if not word_search.words:
-            showInfo('No word found')
-            return False
-        elif len(word_search.words) > 1:
-            SearchWindow.open(pattern)
-            return True
-        else:
-            add_notes(word_search.words)
-            return True
+        word_search.search(pattern, on_done=lambda: on_quick_add_done(pattern))
+        return True
 
     @pyqtSlot()
     def showSettings(self) -> None:
         SettingsWindow.open()
 
+    @pyqtSlot()
+    def showBulkAdd(self) -> None:
+        BulkAddWindow.open()
+
 
 bridge = JavaScriptBridge()
 
 
+def on_quick_add_done(pattern: str) -> None:
+    assert mw is not None
+    word_search = get_word_search()
+    if not word_search.words:
+        showInfo('No word found')
+        return
+    elif len(word_search.words) > 1 or word_search.is_fuzzy:
+        # let the user choose (or confirm a near miss)
+        SearchWindow.open(pattern)
+    else:
+        add_notes(word_search.words)
+    mw.deckBrowser.web.eval('quickAddPattern.value = "";')
+
+
 def render(self: DeckBrowser, _old: Callable[[DeckBrowser], str]) -> str:
     return _old(self) + """
     <fieldset style="width:500px; margin:30px 0 30px 0">
@@ -49,6 +67,7 @@ def render(self: DeckBrowser, _old: Callable[[DeckBrowser], str]) -> str:
         <input style="height:2em; box-sizing:border-box; width:100%; margin:5px; padding:5px;" type="text" id="quick-add-pattern" placeholder="あんき">
         <button onclick="quickAddWord()" style="border:2px solid black">Add Word</button>
         <button onclick="quickAddNoun()">Add Proper Noun</button>
+        <button onclick="edict.showBulkAdd()">Add List</button>
         <button onclick="edict.showSettings()">Settings</button>
     </fieldset>
     <script type="text/javascript" src="qrc:///qtwebchannel/qwebchannel.js"></script>
@@ -61,18 +80,10 @@ def render(self: DeckBrowser, _old: Callable[[DeckBrowser], str]) -> str:
         })}, 100);
     }
     function quickAddWord() {
-        edict.quickAdd(quickAddPattern.value).then(added => {
-            if (added) {
-                quickAddPattern.value = "";
-            }
-        });
+        edict.quickAdd(quickAddPattern.value);
     }
     function quickAddNoun() {
-        edict.quickAdd(quickAddPattern.value, true).then(added => {
-            if (added) {
-                quickAddPattern.value = "";
-            }
-        });
+        edict.quickAdd(quickAddPattern.value, true);
     }
     const quickAddPattern = document.getElementById('quick-add-pattern');
     quickAddPattern.addEventListener('keypress', function(event) {
@@ -81,6 +92,20 @@ def render(self: DeckBrowser, _old: Callable[[DeckBrowser], str]) -> str:
     </script>"""
 
 
+def on_profile_did_open() -> None:
+    assert mw is not None
+    # the dictionaries do not need the collection, so do not hold up the operations that do
+    mw.taskman.run_in_background(preload, on_preload_done, uses_collection=False)
+
+
+def on_preload_done(future: Future) -> None:
+    error = future.exception()
+    if error is not None:
+        showInfo(f'JapaNote: could not load dictionaries: {error}')
+    else:
+        tooltip('JapaNote: dictionaries loaded')
+
+
 def main() -> None:
     assert mw is not None
 
@@ -92,5 +117,8 @@ def main() -> None:
     channel = web_page.webChannel()
     channel.registerObject('edict', bridge)
 
+    # load dictionaries in the background instead of on the first search
+    gui_hooks.profile_did_open.append(on_profile_did_open)
+
 
 main()
@@ -0,0 +1,58 @@
+from aqt.qt import QDialog, QFileDialog, Qt
+
+from .model import BulkAddReport, bulk_add_notes
+from .qt import QtGui, bulkaddwindow
+from .settingswindow import SettingsWindow
+from .view import window_to_front
+
+
+class BulkAddWindow(QDialog):
+    instance = None
+
+    @classmethod
+    def open(cls) -> None:
+        if cls.instance is None:
+            cls.instance = cls()
+        else:
+            window_to_front(cls.instance)
+
+    def closeEvent(self, evt: QtGui.QCloseEvent) -> None:
+        type(self).instance = None
+        self.hide()
+        evt.accept()
+
+    def __init__(self) -> None:
+        QDialog.__init__(self)
+        self.form = bulkaddwindow.Ui_japaNoteBulkAdd()
+        self.form.setupUi(self)  # type: ignore[no-untyped-call]
+        self.form.report.hide()
+
+        # events
+        self.form.openButton.clicked.connect(self.on_open_file)
+        self.form.settingsButton.clicked.connect(SettingsWindow.open)
+        self.form.addButton.clicked.connect(self.on_add_notes)
+        self.form.closeButton.clicked.connect(self.close)
+
+        self.show()
+
+    def keyPressEvent(self, event: QtGui.QKeyEvent) -> None:
+        if event.key() == Qt.Key.Key_Escape:
+            self.close()
+
+    def on_open_file(self) -> None:
+        filename, _ = QFileDialog.getOpenFileName(
+            self, 'Open a vocabulary list', '', 'Text files (*.txt);;All files (*)',
+        )
+        if not filename:
+            return
+        with open(filename, encoding='utf-8-sig') as f:
+            self.form.words.setPlainText(f.read())
+
+    def on_add_notes(self) -> None:
+        patterns = self.form.words.toPlainText().splitlines()
+        if bulk_add_notes(self, patterns, self.on_added):
+            self.form.report.setPlainText('Adding notes…')
+            self.form.report.show()
+
+    def on_added(self, report: BulkAddReport) -> None:
+        self.form.report.setPlainText(report.summary())
@@ -0,0 +1,82 @@
+import contextlib
+import hashlib
+import os
+import pickle
+from typing import Any, Callable, TypeVar
+
+T = TypeVar('T')
+
+# A cache file holds two consecutive pickles:
+#   * a header with the cache version and a signature for each source file
+#   * the compiled data itself
+# The header is small, so a stale cache is detected without unpickling the
+# data. A source file is considered unchanged when its size and modification
+# time match the signature; when only the modification time differs (e.g. the
+# file was copied again), its hash is compared before rebuilding.
+
+
+Signature = tuple[int, int, str]
+
+
+def file_signature(filename: str) -> Signature:
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime_ns, file_digest(filename)
+
+
+def signature_matches(signature: Signature, filename: str) -> bool:
+    size, mtime, digest = signature
+    stat = os.stat(filename)
+    if stat.st_size != size:
+        return False
+    if stat.st_mtime_ns == mtime:
+        return True
+    return file_digest(filename) == digest
+
+
+def file_digest(filename: str) -> str:
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def read_cache(cache_filename: str, sources: list[str], version: int) -> Any:
+    """Return the data stored in cache_filename, or None if it is stale"""
+    try:
+        with open(cache_filename, 'rb') as f:
+            header = pickle.load(f)
+            if header['version'] != version or len(header['sources']) != len(sources):
+                return None
+            for signature, source in zip(header['sources'], sources, strict=True):
+                if not signature_matches(signature, source):
+                    return None
+            return pickle.load(f)
+    except (OSError, EOFError, KeyError, TypeError, ValueError, AttributeError, ImportError, pickle.UnpicklingError):
+        return None
+
+
+def write_cache(cache_filename: str, sources: list[str], version: int, data: object) -> None:
+    """Store data in cache_filename; failures are ignored (e.g. read-only add-on folder)"""
+    header = {
+        'version': version,
+        'sources': [file_signature(source) for source in sources],
+    }
+    tmp_filename = f'{cache_filename}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_filename, 'wb') as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, cache_filename)
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_filename)
+
+
+def load_cached(cache_filename: str, sources: list[str], version: int, build: Callable[[], T]) -> T:
+    """Return the data compiled from sources, building and caching it when needed
+
+    The cache is rebuilt whenever one of the sources changes, or when version
+    differs from the one used to write the cache."""
+    data = read_cache(cache_filename, sources, version)
+    if data is None:
+        data = build()
+        write_cache(cache_filename, sources, version, data)
+    return data  # type: ignore[no-any-return]
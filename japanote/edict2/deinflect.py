@@ -1,7 +1,10 @@
 import os.path
-from typing import Iterator, NamedTuple, Tuple
+from functools import lru_cache
+from typing import Iterable, Iterator, NamedTuple, Tuple
 
 default_deinflect = os.path.join(os.path.dirname(__file__), 'deinflect.dat')
+# number of words whose deinflections are remembered
+deinflect_cache_size = 4096
 
 
 class Rule(NamedTuple):
@@ -14,6 +17,7 @@ class Rule(NamedTuple):
 class Candidate(NamedTuple):
     word: str
     type_: int
+    reasons: tuple[str, ...] = ()  # reasons of the rules applied, from the inflected word
 
 
 SuffixToRules = dict[str, Tuple[list[Rule], 'SuffixToRules']]
@@ -42,7 +46,10 @@ class Deinflector:
     """A Deinflector instance applies deinflection rules to normalize a word"""
     def __init__(self, deinflect_data_filename: str = default_deinflect):
         """Populate deinflecting rules from given file"""
+        self.filename = deinflect_data_filename
         self.suffix_to_rules: SuffixToRules = {}
+        # rules by the suffix they restore, to apply them backwards (see inflect())
+        self.to_to_rules: dict[str, list[Rule]] = {}
         with open(deinflect_data_filename, 'rb') as f:
             lines = iter(f)
             next(lines)  # skip header
@@ -72,19 +79,32 @@ class Deinflector:
                             suffix_to_rules[c] = (rules, new_suffix_to_rules)
                             suffix_to_rules = new_suffix_to_rules
                     assert rules is not None
-                    rules.append(Rule(from_, to, type_, reason))
+                    rule = Rule(from_, to, type_, reason)
+                    rules.append(rule)
+                    self.to_to_rules.setdefault(to, []).append(rule)
+        self.to_lengths = sorted({len(to) for to in self.to_to_rules})
+        self.deinflect = lru_cache(maxsize=deinflect_cache_size)(self._deinflect)
 
-    def __call__(self, word: str) -> Iterator[Candidate]:
-        """Iterate through possible deinflections of word (including word)
+    def __call__(self, word: str) -> tuple[Candidate, ...]:
+        """Return the possible deinflections of word (including word)
 
         Each value is a triplet whose first element is the deinflected word,
         the second element is a mask of possible grammatical classes for the
         word, and the third element is the corresponding reasonning for the
-        inflection"""
+        inflection. Results are memoized."""
+        return self.deinflect(word)
+
+    def deinflect_all(self, words: Iterable[str]) -> dict[str, tuple[Candidate, ...]]:
+        """Return the possible deinflections of each of words"""
+        return {word: self.deinflect(word) for word in words}
+
+    def _deinflect(self, word: str) -> tuple[Candidate, ...]:
+        candidates = []
+        seen = {(word, 0xff)}
         q = [Candidate(word, 0xff)]
         while q:
             candidate = q.pop()
-            yield candidate
+            candidates.append(candidate)
             word = candidate.word
             rules = None
             suffix_to_rules = self.suffix_to_rules
@@ -100,8 +120,40 @@ class Deinflector:
                     # check types match
                     if candidate.type_ & rule.type_ == 0:
                         continue
-                    # append new candidate
-                    q.append(Candidate(
-                        word=word.removesuffix(rule.from_) + rule.to,
-                        type_=rule.type_ >> 8,
-                    ))
+                    # append new candidate, unless the same state was reached another way
+                    new_word = word.removesuffix(rule.from_) + rule.to
+                    new_type = rule.type_ >> 8
+                    if (new_word, new_type) in seen:
+                        continue
+                    seen.add((new_word, new_type))
+                    q.append(Candidate(new_word, new_type, (*candidate.reasons, rule.reason)))
+        return tuple(candidates)
+
+    def inflect(self, word: str, type_: int, max_depth: int) -> Iterator[tuple[str, Candidate]]:
+        """Iterate through the inflected forms of word that deinflect back to it in at most max_depth rules
+
+        Each value is the inflected form along with the candidate that
+        deinflecting it gives for word (type_ is the type of word)."""
+        seen = {(word, type_)}
+        # forms with their type, and the type and reasons of the candidate for word
+        level: list[tuple[str, int, int, tuple[str, ...]]] = [(word, type_, 0, ())]
+        for _ in range(max_depth):
+            next_level: list[tuple[str, int, int, tuple[str, ...]]] = []
+            for form, form_type, word_type, reasons in level:
+                for length in self.to_lengths:
+                    if length > len(form):
+                        break
+                    stem, suffix = form[:len(form) - length], form[len(form) - length:]
+                    for rule in self.to_to_rules.get(suffix, ()):
+                        # the rule must be able to give form with its type
+                        if form_type & (rule.type_ >> 8) == 0:
+                            continue
+                        inflected = (stem + rule.from_, rule.type_ & 0xff)
+                        if inflected in seen:
+                            continue
+                        seen.add(inflected)
+                        inflected_reasons = (rule.reason, *reasons)
+                        inflected_word_type = word_type or (rule.type_ >> 8)
+                        yield inflected[0], Candidate(word, inflected_word_type, inflected_reasons)
+                        next_level.append((*inflected, inflected_word_type, inflected_reasons))
+            level = next_level
@@ -0,0 +1,71 @@
+import heapq
+import re
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator
+
+# parenthesized parts of a gloss are tags (e.g. '(n)', '(1)', '(uk)') or notes
+note_pattern = re.compile(r'\([^)]*\)|\{[^}]*\}')
+token_pattern = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split English text into case-folded words"""
+    return token_pattern.findall(text.casefold())
+
+
+def gloss_tokens(glosses: str) -> Iterator[list[str]]:
+    """Iterate over the words of each gloss of an EDICT entry"""
+    for gloss in glosses.split('/'):
+        if gloss == '(P)' or gloss.startswith('EntL'):
+            continue
+        tokens = tokenize(note_pattern.sub(' ', gloss))
+        if tokens:
+            yield tokens
+
+
+class GlossIndex:
+    """Inverted index from the words of English glosses to entries
+
+    For each word, the index stores the sorted references of the entries
+    with a gloss containing the word, along with the length (in words) of the
+    shortest such gloss. A shorter gloss is a more specific match: for
+    'shape', the gloss 'shape' ranks above 'to take shape'.
+    """
+    def __init__(self, entries: Iterable[tuple[int, str]]) -> None:
+        """Index entries given as (reference, glosses), in increasing reference order"""
+        shortest: dict[str, dict[int, int]] = {}
+        for ref, glosses in entries:
+            for tokens in gloss_tokens(glosses):
+                length = min(len(tokens), 255)
+                for token in tokens:
+                    postings = shortest.setdefault(token, {})
+                    if postings.get(ref, 255) > length:
+                        postings[ref] = length
+        self.postings = {
+            token: (array('I', postings.keys()), array('B', postings.values()))
+            for token, postings in shortest.items()
+        }
+
+    def search(self, query: str, limit: int) -> list[int]:
+        """Return the references of the entries matching every word of query, most specific first"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        try:
+            postings = sorted((self.postings[term] for term in terms), key=lambda posting: len(posting[0]))
+        except KeyError:
+            return []
+
+        # start from the rarest word, then filter with binary searches
+        refs, lengths = postings[0]
+        scores = dict(zip(refs, lengths, strict=True))
+        for other_refs, other_lengths in postings[1:]:
+            filtered = {}
+            for ref, score in scores.items():
+                i = bisect_left(other_refs, ref)
+                if i < len(other_refs) and other_refs[i] == ref:
+                    filtered[ref] = max(score, other_lengths[i])
+            scores = filtered
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return [ref for ref, _ in best]
@@ -0,0 +1,36 @@
+from typing import Callable, Iterable, Optional
+
+from .deinflect import Candidate, Deinflector
+
+# number of rules applied to generate inflected forms; 1 covers forms such as
+# 食べた or 食べない, while deeper forms are left to the deinflector; each
+# level multiplies the size of the index by about 6 (bump index_cache_version
+# in search.py when changing it)
+inflection_depth = 1
+
+
+class InflectionIndex:
+    """Map from the inflected forms of known words to the candidates that deinflecting them gives
+
+    This is the deinflection search done ahead of time for the inflected forms
+    of every verb and adjective of a dictionary, so that looking up such a form
+    is a single dictionary access. The candidates of a form are those of the
+    deinflector, at any depth, minus the ones rejected by is_word (those that
+    name no word of the dictionary), so that searching them gives the same
+    words as searching what the deinflector returns.
+    """
+    def __init__(
+        self, deinflector: Deinflector, words: Iterable[tuple[str, int]], is_word: Callable[[Candidate], bool],
+        max_depth: int = inflection_depth,
+    ):
+        """Index the inflected forms of the given (word, type mask) pairs"""
+        forms = {form for word, type_ in words for form, _ in deinflector.inflect(word, type_, max_depth)}
+        self.forms: dict[str, tuple[Candidate, ...]] = {}
+        for form in forms:
+            # without memoization, which would keep every form; the first
+            # candidate is form itself, which the caller adds back
+            self.forms[form] = tuple(filter(is_word, deinflector._deinflect(form)[1:]))
+
+    def get(self, form: str) -> Optional[tuple[Candidate, ...]]:
+        """Return the deinflected candidates of form that name a known word, or None if form is not indexed"""
+        return self.forms.get(form)
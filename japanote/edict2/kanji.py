@@ -1,14 +1,40 @@
 import os.path
 import re
+from typing import Collection, Optional
+
+from .cache import load_cached
 
 default_kanjidic = os.path.join(os.path.dirname(__file__), 'kanjidic')
 
+# bump when the parsed kanji stored in the cache change
+kanjidic_cache_version = 1
+
+line_pattern = re.compile(r'(.) [0-9A-F]{4} (?:[A-Z]\S* )*([^{]*?) (?:T2[^{]*?)?\{')
+# (.)           captures character
+# [0-9A-F]{4}   skip JIS code
+# (?:[A-Z]\S*)  skip properties
+# ([^{]*?)      captures readings
+# (?:T2[^{]*?)? skip radical name
+# \{            start of the meanings
+
+
+def lengthen_vowel(s: str) -> Optional[str]:
+    last_kana = s[-1]
+    if last_kana in 'かさたなはまやらわがざだばぱか゚ら゚ゃ': return s + 'あ'
+    if last_kana in 'きしちにひみ𛀆りゐぎじぢびぴき゚り゚': return s + 'い'
+    if last_kana in 'くすつぬふむゆる𛄟ぐずづぶぷく゚る゚ゅ': return s + 'う'
+    if last_kana in 'けせてねへめ𛀁れゑげぜでべぺけ゚れ゚': return s + 'え'
+    if last_kana in 'こそとのほもよろをごぞどぼぽこ゚ろ゚ょ': return s + 'お'
+    return None
+
 
 class Kanji:
-    def __init__(self, character: str, readings: list[str], meanings: list[str]) -> None:
+    __slots__ = ('character', 'furigana_readings', 'readings')
+
+    def __init__(self, character: str, readings: tuple[str, ...], furigana_readings: tuple[str, ...]) -> None:
         self.character = character
         self.readings = readings
-        self.meanings = meanings
+        self.furigana_readings = furigana_readings  # readings tried when matching furigana
 
     def __repr__(self) -> str:
         return f'.{self.character}.'
@@ -18,18 +44,19 @@ hiragana = [chr(i) for i in range(0x3040, 0x30A0)]
 katakana = [chr(i) for i in range(0x30A0, 0x3100)]
 
 
+hiragana_to_katakana_table = str.maketrans(dict(zip(hiragana, katakana, strict=True)))
+katakana_to_hiragana_table = str.maketrans(dict(zip(katakana, hiragana, strict=True)))
+
+
 def hiragana_to_katakana(s: str) -> str:
-    return ''.join(katakana[hiragana.index(c)] if c in hiragana else c for c in s)
+    return s.translate(hiragana_to_katakana_table)
 
 
 def katakana_to_hiragana(s: str) -> str:
     # NOTE: ignores ヷ ヸ ヹ ヺ
-    return ''.join(hiragana[katakana.index(c)] if c in katakana else c for c in s)
+    return s.translate(katakana_to_hiragana_table)
 
 
-assert hiragana_to_katakana('くぼ.む') == 'クボ.ム'
-assert katakana_to_hiragana('クボ.ム') == 'くぼ.む'
-
 dakutens = {
     'か': 'が', 'き': 'ぎ', 'く': 'ぐ', 'け': 'げ', 'こ': 'ご',
     'さ': 'ざ', 'し': 'じ', 'す': 'ず', 'せ': 'ぜ', 'そ': 'ぞ',
@@ -51,13 +78,7 @@ def normalize_reading(reading: str) -> str:
     return reading
 
 
-assert normalize_reading('くぼ.む') == 'くぼ'
-assert normalize_reading('クボ.ム') == 'くぼ'
-assert normalize_reading('もの-') == 'もの'
-assert normalize_reading('-カタ') == 'かた'
-
-
-def compound_readings(readings: set[str]) -> set[str]:
+def compound_readings(readings: Collection[str]) -> set[str]:
     gemination = {reading[:-1] + 'っ' for reading in readings}
     rendaku = {
         dakuten + reading[1:]
@@ -68,9 +89,11 @@ def compound_readings(readings: set[str]) -> set[str]:
 
 
 def load_kanjidic(filename: str = default_kanjidic) -> dict[str, Kanji]:
-    with open(filename, mode='rb') as f:
-        edict_data = f.read().decode('euc_jp')
+    """Return the kanji of kanjidic with their readings, from the cache when it is up to date"""
+    return load_cached(filename + '.cache', [filename], kanjidic_cache_version, lambda: parse_kanjidic(filename))
 
+
+def parse_kanjidic(filename: str = default_kanjidic) -> dict[str, Kanji]:
     # For instance, skipping many of the tags, the entry for 形 looks like this:
     # 形 3741 U5f62 B59 Yxing2 Whyeong ケイ ギョウ かた -がた かたち なり T1 ち {shape} {form} {style}
     # We find:
@@ -81,26 +104,28 @@ def load_kanjidic(filename: str = default_kanjidic) -> dict[str, Kanji]:
     # - The nanori readings: T1 ち
     # - The radical name would be preceded by the marker T2 (e.g. T2 おの)
     # - The meanings: {shape} {form} {style}
-    line_pattern = re.compile(r'(?m)^(.) (?:[0-9A-F]{4}) (?:(?:[A-Z]\S*) )*([^{]*?) (?:T2[^{]*?)?((?:\{.*?\} )*\{.*?\})')
-    # (?m)^                  start of line
-    # (.)                    captures character
-    # [0-9A-F]{4}            skip JIS code
-    # (?:[A-Z]\S*)           skip properties
-    # ([^{]*?)               captures readings
-    # (?:T2[^{]*?)?          skip radical name
-    # ((?:\{.*?\} )*\{.*?\}) captures meanings
-
+    # Only the character and the readings are kept. Lines are parsed one at a
+    # time to avoid decoding the whole file at once.
     kanjidic = {}
-    meaning_pattern = re.compile(r'{(.*?)}')
-    for character, readings, meanings in line_pattern.findall(edict_data):
-        # gather kanji information
-        meanings = meaning_pattern.findall(meanings)
-        readings = [normalize_reading(reading) for reading in readings.split() if reading != 'T1']
-        readings.extend(compound_readings(readings))
-        # remove duplicates while keeping order
-        readings = list(dict.fromkeys(readings))
-        kanji = Kanji(character, readings, meanings)
-
-        # map character to kanji
-        kanjidic[character] = kanji
+    with open(filename, mode='rb') as f:
+        next(f)  # skip header
+        for byte_line in f:
+            match = line_pattern.match(byte_line.decode('euc_jp'))
+            if match is None:
+                continue
+            character, readings_field = match.groups()
+            readings = [normalize_reading(reading) for reading in readings_field.split() if reading != 'T1']
+            readings.extend(sorted(compound_readings(readings)))
+            # remove duplicates while keeping order
+            readings = list(dict.fromkeys(readings))
+            # add lengthened readings for furigana (lower priority)
+            furigana_readings = list(readings)
+            for reading in readings:
+                lengthened = lengthen_vowel(reading)
+                if lengthened is not None:
+                    furigana_readings.append(lengthened)
+            furigana_readings = list(dict.fromkeys(furigana_readings))
+
+            # map character to kanji
+            kanjidic[character] = Kanji(character, tuple(readings), tuple(furigana_readings))
     return kanjidic
@@ -0,0 +1,35 @@
+import gc
+import sys
+from types import FunctionType, ModuleType
+from typing import Iterable
+
+from .furigana import get_kanjidic
+from .search import Edict, edict, enamdict
+
+
+def deep_getsizeof(*objects: object) -> int:
+    """Return the size of objects and of everything they reference, counting shared objects once
+
+    Classes, modules and functions are not counted: they are shared with the
+    rest of the program."""
+    seen = set()
+    size = 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, ModuleType, FunctionType)):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return size
+
+
+def memory_report(dictionaries: Iterable[tuple[str, Edict]] = (('edict', edict), ('enamdict', enamdict))) -> str:
+    """Load the dictionaries and return the memory they use, one per line"""
+    lines = []
+    for name, dictionary in dictionaries:
+        dictionary.load()
+        lines.append(f'{name}: {deep_getsizeof(dictionary) / 1e6:.1f} MB')
+    lines.append(f'kanjidic: {deep_getsizeof(get_kanjidic()) / 1e6:.1f} MB')
+    return '\n'.join(lines)
@@ -0,0 +1,172 @@
+from array import array
+from bisect import bisect_left
+from collections import deque
+from itertools import accumulate, pairwise
+from typing import Container, Iterable, Iterator, NamedTuple
+
+
+class PrefixMatch(NamedTuple):
+    key_ids: list[int]  # keys that are prefixes of the text, shortest first
+    length: int  # length of the longest prefix of the text that starts some key
+    completions: range  # keys starting with that prefix
+
+
+class PrefixIndex:
+    """Trie of normalized keys for exact, common-prefix and completion lookups
+
+    Keys are identified by their rank in sorted order, so that the keys
+    below a node of the trie are a contiguous range of ids. The trie is stored
+    in flat arrays, with nodes numbered in breadth-first order so that the
+    children of a node are consecutive:
+      * labels[node] is the character leading to node (the root has none)
+      * the children of node are child_starts[node] to child_starts[node + 1]
+      * the keys below node are key_starts[node] to key_ends[node]
+    A node ends a key when the first key below it is not below its first
+    child. The root has thousands of children (one per first character), so
+    they are also found through the root_children dict.
+
+    The keys themselves are packed into a single string, key i being
+    text[offsets[i]:offsets[i + 1]]. All of this takes a few bytes per
+    character instead of a str object (and a dict entry) per key.
+    """
+    def __init__(self, keys: Iterable[str]) -> None:
+        keys = sorted(keys)
+        self.text = ''.join(keys)
+        self.offsets = array('I', accumulate(map(len, keys), initial=0))
+
+        # visit the ranges of keys sharing a prefix in breadth-first order
+        labels = ['\0']
+        self.child_starts = array('I')
+        self.key_starts = array('I', [0])
+        self.key_ends = array('I', [len(keys)])
+        queue = deque([(0, len(keys), 0)])
+        while queue:
+            lo, hi, depth = queue.popleft()
+            self.child_starts.append(len(labels))
+            if lo < hi and len(keys[lo]) == depth:
+                lo += 1  # the key of this node
+            while lo < hi:
+                c = keys[lo][depth]
+                child_hi = bisect_left(keys, keys[lo][:depth] + chr(ord(c) + 1), lo, hi)
+                labels.append(c)
+                self.key_starts.append(lo)
+                self.key_ends.append(child_hi)
+                queue.append((lo, child_hi, depth + 1))
+                lo = child_hi
+        self.child_starts.append(len(labels))
+        self.labels = ''.join(labels)
+        self.root_children = {labels[node]: node for node in range(self.child_starts[0], self.child_starts[1])}
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, key_id: int) -> str:
+        return self.text[self.offsets[key_id]:self.offsets[key_id + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        text = self.text
+        for start, end in pairwise(self.offsets):
+            yield text[start:end]
+
+    def is_key(self, node: int) -> bool:
+        """Tell whether the path to node spells a key"""
+        first_child = self.child_starts[node]
+        if first_child == self.child_starts[node + 1]:
+            return self.key_starts[node] < self.key_ends[node]  # only the root may be a leaf without key
+        return self.key_starts[first_child] != self.key_starts[node]
+
+    def walk(self, text: str) -> tuple[int, int]:
+        """Follow text down the trie, returning the length matched and the node reached"""
+        labels, child_starts = self.labels, self.child_starts
+        node = self.root_children.get(text[:1], -1)
+        if node < 0:
+            return 0, 0
+        for length in range(1, len(text)):
+            child = labels.find(text[length], child_starts[node], child_starts[node + 1])
+            if child < 0:
+                return length, node
+            node = child
+        return len(text), node
+
+    def find(self, key: str) -> int:
+        """Return the id of key, or -1 if it is not in the index"""
+        length, node = self.walk(key)
+        if length < len(key) or not self.is_key(node):
+            return -1
+        return self.key_starts[node]
+
+    def prefix_range(self, prefix: str) -> range:
+        """Return the ids of the keys starting with prefix"""
+        length, node = self.walk(prefix)
+        if length < len(prefix):
+            return range(0)
+        return range(self.key_starts[node], self.key_ends[node])
+
+    def match(self, text: str) -> PrefixMatch:
+        """Follow text down the trie, collecting the keys met on the way
+
+        This gives both the keys that are prefixes of text (common-prefix
+        search) and the keys that complete the matched part (predictive
+        search) in a single traversal."""
+        labels, child_starts, key_starts = self.labels, self.child_starts, self.key_starts
+        key_ids = []
+        node = 0
+        length = 0
+        for c in text:
+            if node == 0:
+                child = self.root_children.get(c, -1)
+            else:
+                child = labels.find(c, child_starts[node], child_starts[node + 1])
+            if child < 0:
+                break
+            node = child
+            length += 1
+            if self.is_key(node):
+                key_ids.append(key_starts[node])
+        return PrefixMatch(key_ids, length, range(key_starts[node], self.key_ends[node]))
+
+    def prefix_ranges(self, prefixes: Iterable[str]) -> list[range]:
+        """Return the ids of the keys starting with any of prefixes, as disjoint ranges in sorted order"""
+        # drop prefixes covered by a shorter one, so that no key is repeated
+        kept: list[str] = []
+        for prefix in sorted(set(prefixes)):
+            if not kept or not prefix.startswith(kept[-1]):
+                kept.append(prefix)
+        return [self.prefix_range(prefix) for prefix in kept]
+
+    def fuzzy(self, word: str, max_distance: int, alphabet: Container[str]) -> list[tuple[int, int]]:
+        """Return the keys within max_distance edits of word, as (distance, key id) sorted by distance
+
+        Only the keys made of characters of alphabet are considered. Each node
+        of the trie carries the row of the Levenshtein matrix between its
+        prefix and word. Subtrees whose row exceeds max_distance are pruned.
+        """
+        labels, child_starts = self.labels, self.child_starts
+        n = len(word)
+        results = []
+
+        def walk(node: int, row: list[int]) -> None:
+            if row[n] <= max_distance and self.is_key(node):
+                results.append((row[n], self.key_starts[node]))
+            for child in range(child_starts[node], child_starts[node + 1]):
+                c = labels[child]
+                if c not in alphabet:
+                    continue
+                # next row of the Levenshtein matrix (the builtin min is slower
+                # than a comparison on two ints, so only used once per row)
+                left = row[0] + 1
+                child_row = [left]
+                for i in range(n):
+                    substitution = row[i] if word[i] == c else row[i] + 1
+                    above = row[i + 1]
+                    # deletion or insertion
+                    gap = (above if above < left else left) + 1
+                    left = substitution if substitution < gap else gap
+                    child_row.append(left)
+                if min(child_row) <= max_distance:
+                    walk(child, child_row)
+
+        walk(0, list(range(n + 1)))
+        results.sort()
+        return results
+
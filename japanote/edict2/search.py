@@ -1,30 +1,119 @@
+import mmap
 import os.path
 import re
-from typing import Iterator, Optional
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from functools import cache, lru_cache
+from heapq import nlargest
+from importlib import import_module
+from itertools import chain
+from operator import itemgetter
+from types import ModuleType
+from typing import Iterable, Iterator, Optional, Sequence
 
-from .. import romkan
+from .cache import load_cached
+from .deinflect import Candidate, Deinflector
 from .furigana import furigana_from_kanji_kana
+from .glosses import GlossIndex
+from .inflections import InflectionIndex
+from .prefix import PrefixIndex
+from .wildcard import NgramIndex, compile_wildcard, split_wildcard
 
 # default filenames
 default_edict = os.path.join(os.path.dirname(__file__), 'edict2')
 default_enamdict = os.path.join(os.path.dirname(__file__), 'enamdict')
 
+# bump when the compiled index stored in the cache changes
+index_cache_version = 9
+
 # pre-compile regular expressions
-edict_line_pattern = re.compile(r'(?m)^(\S*) (?:\[(\S*?)\] )?/(.*)/$')
-common_marker = re.compile(r'\([^)]*\)')
 gloss_pattern = re.compile(r'^(?:\(([^0-9]\S*)\) )?(?:\(([0-9]+)\) )?(.*)')
+ascii_pattern = re.compile(r'[\x00-\x7f]')
+whitespace_pattern = re.compile(r'\s')
+tag_group_pattern = re.compile(r'\(([^()\s]+)\) ?')
+# trailing romaji that romkan could not convert yet (e.g. 'k' in 'たべk')
+romaji_tail_pattern = re.compile(r'[a-z\']+$')
+
+# characters of normalized readings (hiragana and 'ー'), for fuzzy search
+reading_chars = frozenset(map(chr, range(0x3041, 0x30a0))) | {'ー'}
+
+# tags that give the grammatical class of a word, with the corresponding bit
+# of the type mask used by Deinflector (see deinflect.py)
+type_tag_patterns = [
+    (1<<0, re.compile(r'v1(?:-.*)?')),  # 一段 verb
+    (1<<1, re.compile(r'v5.(?:-.*)?')),  # 五段 verb
+    (1<<2, re.compile(r'adj-i')),  # い-adjective
+    (1<<3, re.compile(r'vk')),  # くる verb
+    (1<<4, re.compile(r'vs(?:-.*)?')),  # する verb
+]
+
+# Priority of an entry for one of its keys, computed when indexing: entries
+# whose writing or reading matching the key is marked common ('(P)') come
+# first, then entries with another form marked common.
+common_form_priority = 2
+common_entry_priority = 1
+# while indexing, a reference and its priority are packed as ref * priority_levels + priority
+priority_levels = 3
+# added to the priority of the entries found under the searched form itself,
+# rather than under one of its deinflections
+exact_match_priority = 2
+# a wildcard search with more candidate keys than this lists its words in key
+# order as it finds them rather than ranking all of them first, so that the
+# first words of a broad pattern (e.g. '*か*') come at once
+ranked_search_max_keys = 2000
+
+# number of words kept materialized by a lazy Edict
+lazy_cache_size = 4096
+
+# Keys are normalized with romkan.to_hiragana(romkan.to_roma(key)), which
+# folds katakana into hiragana through two regex passes over romaji. For
+# strings without ASCII characters, the round trip is equivalent to the
+# tables below (found by comparing both on every string of up to three kana).
+# Longer sequences come first so that the pattern prefers them.
+# Note that some of them are romkan quirks rather than proper foldings.
+kana_pairs = {
+    'ッシェ': 'ssへ',
+    'ッディ': 'っでぃ',
+    'ウォ': 'を',
+    'シェ': 'sへ',
+    'ティ': 'ち',
+    'ディ': 'ぢ',
+    'ドゥ': 'づ',
+    'フュ': 'ふ',
+}
+kana_pair_pattern = re.compile('|'.join(kana_pairs))
+kana_table = str.maketrans({
+    **{chr(c): chr(c - 0x60) for c in range(ord('ァ'), ord('ン') + 1)},
+    'ゐ': 'うぃ',
+    'ゑ': 'うぇ',
+    'ヰ': 'うぃ',
+    'ヱ': 'うぇ',
+    'ヴ': 'う゛',
+})
 
 
 class Word:
-    def __init__(self, writings: list[str], readings: list[str], glosses: str, edict_entry: str, edict_offset: Optional[int] = None) -> None:
+    # there is one Word per dictionary entry, so avoid a per-instance __dict__
+    __slots__ = (
+        '_furigana', 'common_forms', 'edict_offset', 'glosses', 'kana', 'kanji', 'readings', 'type_', 'writings',
+    )
+
+    def __init__(
+        self, writings: tuple[str, ...], readings: tuple[str, ...], glosses: str,
+        edict_offset: Optional[int] = None, common_forms: int = 0,
+    ) -> None:
         self.writings = writings
         self.readings = readings
         self.glosses = glosses
-        self.edict_entry = edict_entry
         self.edict_offset = edict_offset
+        # bit i is set when the i-th form of writings + readings is marked common ('(P)')
+        self.common_forms = common_forms
 
         self.kanji = self.writings[0]
         self.kana = self.readings[0] if self.readings else self.kanji
+        self.type_ = type_mask(parse_tags(glosses))
 
         self._furigana: Optional[str] = None
 
@@ -32,7 +121,7 @@ class Word:
         return f'<{self.kanji}>'
 
     def get_sequence_number(self) -> str:
-        last_gloss = self.glosses.split('/')[-1]
+        last_gloss = self.glosses.rpartition('/')[2]
         assert last_gloss[:4] == 'EntL'
         return last_gloss
 
@@ -73,74 +162,490 @@ class Word:
         list_ = '<ol>%s</ol>' % ''.join(items)
         return list_
 
+    def get_tags(self) -> set[str]:
+        return parse_tags(self.glosses)
+
     def get_type(self) -> int:
         """Return type mask for deinflections"""
-        type_ = 1<<7
-        if re.search(r'\bv1\b', self.glosses):
-            type_ |= 1<<0
-        if re.search(r'\bv5.\b', self.glosses):
-            type_ |= 1<<1
-        if re.search(r'\badj-i\b', self.glosses):
-            type_ |= 1<<2
-        if re.search(r'\bvk\b', self.glosses):
-            type_ |= 1<<3
-        if re.search(r'\bvs\b', self.glosses):
-            type_ |= 1<<4
-        return type_
+        return self.type_
+
+    def form_priorities(self) -> Iterator[tuple[str, int]]:
+        """Iterate over the writings and readings with the priority of the entry for each of them"""
+        common_forms = self.common_forms
+        for i, form in enumerate(self.writings + self.readings):
+            if common_forms >> i & 1:
+                yield form, common_form_priority
+            elif common_forms:
+                yield form, common_entry_priority
+            else:
+                yield form, 0
+
+
+def parse_tags(glosses: str) -> set[str]:
+    """Return the tags of an entry from the markers at the start of its glosses
+
+    For instance, for '(v1,vt) (1) to eat/(2) to live on/(P)/EntL1358280X',
+    it returns {'v1', 'vt', 'P'}. Sense numbers are not tags.
+    """
+    tags = set()
+    for gloss in glosses.split('/'):
+        position = 0
+        while (match := tag_group_pattern.match(gloss, position)) is not None:
+            tags.update(match.group(1).split(','))
+            position = match.end()
+    return {tag for tag in tags if not tag.isdigit()}
+
+
+@cache
+def tag_type(tag: str) -> int:
+    type_ = 0
+    for bit, pattern in type_tag_patterns:
+        if pattern.fullmatch(tag):
+            type_ |= bit
+    return type_
+
+
+def type_mask(tags: Iterable[str]) -> int:
+    """Return the type mask for deinflections of a word with the given tags"""
+    type_ = 1<<7
+    for tag in tags:
+        type_ |= tag_type(tag)
+    return type_
+
+
+@cache
+def get_romkan() -> ModuleType:
+    """Return the romkan module, imported on first use since it compiles many regular expressions"""
+    return import_module('..romkan', __package__)
+
+
+def normalize_key(key: str) -> str:
+    """Fold a writing or a reading into the form used as a key in Edict.prefix_index"""
+    folded = key.lower()
+    if not ascii_pattern.search(folded):
+        folded = kana_pair_pattern.sub(lambda match: kana_pairs[match.group()], folded)
+        return folded.translate(kana_table)
+    # romaji, or kana mixed with ASCII (e.g. 'CD-ROM', 'Tシャツ')
+    romkan = get_romkan()
+    return romkan.to_hiragana(romkan.to_roma(key))
+
+
+def prefix_candidates(pattern: str) -> list[str]:
+    """Return the kana prefixes a partially typed pattern may stand for
+
+    The pattern is converted with romkan; a trailing partial mora is expanded
+    to every kana it may start. For instance, 'tabek' gives 'たべか', 'たべき',
+    'たべく', 'たべけ', 'たべこ', 'たべっ' (for 'kk'), etc. A trailing 'n' may
+    be 'ん' or the start of 'な', 'に', etc.
+    """
+    romkan = get_romkan()
+    converted = romkan.to_hiragana(pattern)
+    match = romaji_tail_pattern.search(converted)
+    if match is not None:
+        head, tail = converted[:match.start()], match.group()
+    elif pattern.lower().endswith('n') and not pattern.lower().endswith('nn') and converted.endswith('ん'):
+        head, tail = converted[:-1], 'n'
+    else:
+        return [converted]
+    return [
+        head + kana
+        for romaji, kana in romkan.ROMKAN_H.items()
+        if romaji.startswith(tail)
+    ] or [converted]
+
+
+def strip_markers(field: str) -> str:
+    """Remove parenthesized markers, e.g. '食べる(P)' → '食べる'"""
+    while (start := field.find('(')) >= 0:
+        end = field.find(')', start)
+        if end < 0:
+            break
+        field = field[:start] + field[end + 1:]
+    return field
+
+
+def parse_line(line: str, offset: Optional[int] = None) -> Optional[Word]:
+    """Parse an EDICT line into a Word, or return None if the line is malformed
+
+    An EDICT2 line looks like this:
+    食べる(P);喰べる [たべる(P)] /(v1,vt) (1) to eat/(2) to live on/(P)/EntL1358280X/
+    """
+    head, sep, rest = line.partition(' /')
+    if not sep:
+        return None
+    swritings, sep, sreadings = head.partition(' [')
+    if sep:
+        if sreadings[-1:] != ']':
+            return None
+        sreadings = sreadings[:-1]
+    if whitespace_pattern.search(swritings) or whitespace_pattern.search(sreadings):
+        return None
+    if rest[-2:] == '/\n':
+        glosses = rest[:-2]
+    elif rest[-1:] == '/':
+        glosses = rest[:-1]
+    else:
+        return None
+    if '\n' in glosses:
+        return None
+    # many entries share a reading (e.g. 'こう'), so intern them
+    writings = tuple(map(sys.intern, strip_markers(swritings).split(';')))
+    readings = tuple(map(sys.intern, strip_markers(sreadings).split(';'))) if sreadings else ()
+    common_forms = 0
+    if '(P)' in head:
+        forms = swritings.split(';') + (sreadings.split(';') if sreadings else [])
+        for i, form in enumerate(forms):
+            if '(P)' in form:
+                common_forms |= 1 << i
+    return Word(writings, readings, glosses, offset, common_forms)
+
+
+# Entries are referred to by an integer: in eager mode, this is an index in
+# Edict.entries; in lazy mode, this is the byte offset of the entry's line in
+# the dictionary file, and Word objects are only parsed when a search returns
+# them. While indexing, references are packed with their priority (see
+# priority_levels).
+EntryRefs = int | list[int]
+
+# The map from normalized keys to entries is stored compactly: the keys in a
+# PrefixIndex, and the references in a flat array where those of key i are
+# refs[ref_starts[i]:ref_starts[i + 1]], with their priorities in a parallel
+# array. The ids of the keys with a common entry (priority above 0), only a
+# few percent of them, are kept in a sorted array as well, for prefix search.
+CompiledIndex = tuple[PrefixIndex, Sequence[int], Sequence[int], Sequence[int], Sequence[int]]
 
 
 class Edict:
-    def __init__(self, filename: str = default_edict):
+    def __init__(self, filename: str = default_edict, lazy: bool = False):
         self.filename = filename
-        self.words: dict[str, Word | list[Word]] = {}
+        self.lazy = lazy
+        self.entries: list[Word] = []
+        self.prefix_index = PrefixIndex(())
+        self.ref_starts: Sequence[int] = array('I', [0])
+        self.refs: Sequence[int] = array('I')
+        self.priorities: Sequence[int] = array('B')
+        self.common_keys: Sequence[int] = array('I')
+        self.gloss_index: Optional[GlossIndex] = None  # loaded on first English search
+        self.ngram_index: Optional[NgramIndex] = None  # loaded on first wildcard search
+        self.inflection_index: Optional[InflectionIndex] = None  # only loaded on request
+        self._map: Optional[mmap.mmap] = None
+        self.lock = threading.Lock()
+        self.read_word = lru_cache(maxsize=lazy_cache_size)(self._read_word)
 
-    def load(self):
-        if self.words:
+    def load(self) -> None:
+        """Load the index, waiting for the end of any load running in another thread"""
+        if self.prefix_index:
             return
+        with self.lock:
+            if self.prefix_index:
+                return  # loaded while waiting for the lock
+            # self.prefix_index is set last since it tells whether the index is ready
+            if self.lazy:
+                prefix_index, self.ref_starts, self.refs, self.priorities, self.common_keys = load_cached(
+                    self.cache_filename(), [self.filename], index_cache_version, self.build_lazy_index,
+                )
+                with open(self.filename, 'rb') as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                (prefix_index, self.ref_starts, self.refs, self.priorities, self.common_keys), self.entries = (
+                    load_cached(self.cache_filename(), [self.filename], index_cache_version, self.build_index)
+                )
+            self.prefix_index = prefix_index
 
-        with open(self.filename) as f:
-            lines = iter(f)
-            next(lines)  # skip header
-            for line in lines:
-                match = edict_line_pattern.match(line)
-                if not match:
-                    continue
+    def cache_filename(self, kind: Optional[str] = None) -> str:
+        """Return the name of the cache file for the given kind of index (e.g. 'edict2.glosses.cache')"""
+        parts = [self.filename]
+        if self.lazy:
+            parts.append('lazy')  # references are offsets instead of indices
+        if kind is not None:
+            parts.append(kind)
+        parts.append('cache')
+        return '.'.join(parts)
+
+    def iter_lines(self) -> Iterator[tuple[int, str]]:
+        """Iterate over the entry lines of the dictionary file with their byte offsets"""
+        with open(self.filename, 'rb') as f:
+            offset = len(next(f))  # skip header
+            for byte_line in f:
+                yield offset, byte_line.decode()
+                offset += len(byte_line)
+
+    def build_index(self) -> tuple[CompiledIndex, list[Word]]:
+        """Parse the dictionary file and map normalized keys to entries"""
+        entries = []
+        for offset, line in self.iter_lines():
+            word = parse_line(line, offset)
+            if word is not None:
+                entries.append(word)
+        words = self.index_keys((i, word) for i, word in enumerate(entries))
+        return self.compile_index(words), entries
+
+    def build_lazy_index(self) -> CompiledIndex:
+        """Parse the dictionary file and map normalized keys to entry offsets"""
+        return self.compile_index(self.index_keys(self.iter_entries()))
+
+    def build_gloss_index(self) -> GlossIndex:
+        return GlossIndex((ref, word.glosses) for ref, word in self.iter_entries())
+
+    def build_inflection_index(self, deinflector: Deinflector) -> InflectionIndex:
+        """Generate the inflected forms of the writings and readings of the verbs and adjectives"""
+        # a form may belong to several entries (e.g. 'かえる'), so merge their
+        # types; forms are not normalized since the deinflector works on what
+        # was typed, which is also what the index is looked up with
+        types: dict[str, int] = {}
+        for _, word in self.iter_entries():
+            if word.type_ & 0x7f == 0:
+                continue  # not inflected
+            for form in word.writings + word.readings:
+                types[form] = types.get(form, 0) | word.type_
+        return InflectionIndex(deinflector, types.items(), self.has_word)
 
-                # gather information for new word
-                swritings, sreadings, glosses = match.groups()
-                writings = common_marker.sub('', swritings).split(';')
-                readings = common_marker.sub('', sreadings).split(';') if sreadings else []
-                word = Word(writings, readings, glosses, line)
-
-                # normalize keys (reading and writings)
-                keys = {romkan.to_hiragana(romkan.to_roma(key)) for key in writings + readings}
-
-                # map keys to words
-                for key in keys:
-                    try:
-                        entries = self.words[key]
-                    except KeyError:
-                        self.words[key] = word
+    def has_word(self, candidate: Candidate) -> bool:
+        """Tell whether search_candidates() finds a word for candidate"""
+        key_id = self.prefix_index.find(normalize_key(candidate.word))
+        return key_id >= 0 and any(
+            self.get_word(ref).type_ & candidate.type_ for ref, _ in self.key_entries(key_id)
+        )
+
+    def load_inflection_index(self, deinflector: Deinflector) -> InflectionIndex:
+        """Return the index of inflected forms, loading it if needed"""
+        self.load()
+        if self.inflection_index is None:
+            with self.lock:
+                if self.inflection_index is None:
+                    self.inflection_index = load_cached(
+                        self.cache_filename('inflections'), [self.filename, deinflector.filename],
+                        index_cache_version, lambda: self.build_inflection_index(deinflector),
+                    )
+        return self.inflection_index
+
+    def iter_entries(self) -> Iterator[tuple[int, Word]]:
+        """Iterate over all the entries with their references, in reference order"""
+        if self.lazy:
+            for offset, line in self.iter_lines():
+                word = parse_line(line, offset)
+                if word is not None:
+                    yield offset, word
+        else:
+            yield from enumerate(self.entries)
+
+    @staticmethod
+    def index_keys(words: Iterator[tuple[int, Word]]) -> dict[str, EntryRefs]:
+        index: dict[str, EntryRefs] = {}
+        for ref, word in words:
+            # normalize keys (reading and writings); several forms may give
+            # the same key, so keep the best priority
+            keys: dict[str, int] = {}
+            for key, priority in word.form_priorities():
+                normalized = normalize_key(key)
+                keys[normalized] = max(priority, keys.get(normalized, 0))
+
+            # map keys to entries
+            for key, priority in keys.items():
+                packed = ref * priority_levels + priority
+                try:
+                    refs = index[key]
+                except KeyError:
+                    index[key] = packed
+                else:
+                    if isinstance(refs, list):
+                        refs.append(packed)
                     else:
-                        if isinstance(entries, list):
-                            entries.append(word)
-                        else:
-                            self.words[key] = [entries, word]
+                        index[key] = [refs, packed]
+        return index
+
+    @staticmethod
+    def compile_index(index: dict[str, EntryRefs]) -> CompiledIndex:
+        """Pack the map from keys to references into a PrefixIndex and flat arrays of references and priorities"""
+        prefix_index = PrefixIndex(index)
+        ref_starts = array('I', [0])
+        refs = array('I')
+        priorities = array('B')
+        common_keys = array('I')
+        for key_id, key in enumerate(prefix_index):
+            key_refs = index[key]
+            common = False
+            for packed in key_refs if isinstance(key_refs, list) else (key_refs,):
+                ref, priority = divmod(packed, priority_levels)
+                refs.append(ref)
+                priorities.append(priority)
+                common = common or priority > 0
+            ref_starts.append(len(refs))
+            if common:
+                common_keys.append(key_id)
+        return prefix_index, ref_starts, refs, priorities, common_keys
+
+    def _read_word(self, offset: int) -> Word:
+        assert self._map is not None
+        end = self._map.find(b'\n', offset)
+        line = self._map[offset:end + 1 if end >= 0 else len(self._map)].decode()
+        word = parse_line(line, offset)
+        assert word is not None
+        return word
+
+    def get_word(self, ref: int) -> Word:
+        if self.lazy:
+            return self.read_word(ref)
+        return self.entries[ref]
+
+    def key_entries(self, key_id: int) -> Iterator[tuple[int, int]]:
+        """Iterate over the (reference, priority) of the entries with the key of the given id in prefix_index"""
+        start, end = self.ref_starts[key_id], self.ref_starts[key_id + 1]
+        return zip(self.refs[start:end], self.priorities[start:end], strict=True)
+
+    def top_refs(self, scored: Iterable[tuple[int, int]], limit: Optional[int]) -> list[int]:
+        """Return the references of the entries given as (reference, score), best first, up to limit
+
+        An entry given several times keeps its best score, and entries of equal
+        score keep their order. The best entries are selected with a heap, so
+        the others are never sorted, nor even parsed by a lazy Edict."""
+        best: dict[int, int] = {}
+        for ref, score in scored:
+            # scores may be negative (see search_fuzzy), so a new entry defaults to below its score
+            if best.get(ref, score - 1) < score:
+                best[ref] = score
+        if limit is None:
+            ranked = sorted(best.items(), key=itemgetter(1), reverse=True)
+        else:
+            ranked = nlargest(limit, best.items(), key=itemgetter(1))
+        return [ref for ref, _ in ranked]
+
+    def top_words(self, scored: Iterable[tuple[int, int]], limit: Optional[int]) -> Iterator[Word]:
+        """Iterate over the entries given as (reference, score), best first, up to limit (see top_refs)"""
+        for ref in self.top_refs(scored, limit):
+            yield self.get_word(ref)
+
+    def words_in_key_order(self, key_ids: Iterable[int], limit: Optional[int], seen: set[int]) -> Iterator[Word]:
+        """Iterate over the entries of key_ids not in seen, in key order as they are found, until seen reaches limit"""
+        if len(seen) == limit:
+            return
+        for key_id in key_ids:
+            for ref, _ in self.key_entries(key_id):
+                if ref in seen:
+                    continue
+                seen.add(ref)
+                yield self.get_word(ref)
+                if len(seen) == limit:
+                    return
+
+    def words_of_keys(self, key_ids: Iterable[int], key_count: int, limit: Optional[int]) -> Iterator[Word]:
+        """Iterate over the entries of key_ids, most common first, up to limit
+
+        Ranking needs every entry, so when there are more than
+        ranked_search_max_keys keys (key_count, which may be more than those
+        of key_ids that are actually found), entries are listed in key order
+        as they are found instead."""
+        if key_count <= ranked_search_max_keys:
+            yield from self.top_words((entry for key_id in key_ids for entry in self.key_entries(key_id)), limit)
+        else:
+            yield from self.words_in_key_order(key_ids, limit, set())
 
     def search(self, word: str) -> Iterator[Word]:
+        """Iterate over the words with word as a writing or a reading, most common first"""
         # normalize kana
-        word = romkan.to_hiragana(romkan.to_roma(word))
+        word = normalize_key(word)
         self.load()
-        try:
-            entries = self.words[word]
-        except KeyError:
-            return
-        else:
-            if isinstance(entries, list):
-                yield from entries
-            else:
-                yield entries
+        key_id = self.prefix_index.find(word)
+        if key_id >= 0:
+            yield from self.top_words(self.key_entries(key_id), None)
+
+    def search_candidates(self, candidates: Iterable[Candidate], limit: Optional[int] = None) -> list[Word]:
+        """Return the words for deinflection candidates, when their grammatical class allows it, best first
+
+        Words are ranked by their priority, plus exact_match_priority when found
+        without deinflection."""
+        self.load()
+        scored = []
+        for candidate in candidates:
+            key_id = self.prefix_index.find(normalize_key(candidate.word))
+            if key_id < 0:
+                continue
+            bonus = 0 if candidate.reasons else exact_match_priority
+            for ref, priority in self.key_entries(key_id):
+                if self.get_word(ref).type_ & candidate.type_:
+                    scored.append((ref, priority + bonus))
+        return list(self.top_words(scored, limit))
+
+    def search_prefix(self, pattern: str, limit: Optional[int] = None) -> Iterator[Word]:
+        """Iterate over the words with a key starting with pattern, most common first
+
+        The pattern may end with a partially typed romaji mora (e.g. 'tabek').
+
+        Only the common entries (priority above 0) need ranking, and their keys
+        are found by bisecting each range of keys into common_keys, so even a
+        broad prefix (e.g. 'か') is ranked without reading all of its entries.
+        The other entries follow in key order."""
+        prefixes = [normalize_key(prefix) for prefix in prefix_candidates(pattern)]
+        self.load()
+        ranges = self.prefix_index.prefix_ranges(prefixes)
+        common_keys = self.common_keys
+        common = (
+            (ref, priority)
+            for start, stop in ((bisect_left(common_keys, r.start), bisect_left(common_keys, r.stop)) for r in ranges)
+            for key_id in common_keys[start:stop]
+            for ref, priority in self.key_entries(key_id)
+            if priority
+        )
+        ranked = self.top_refs(common, limit)
+        for ref in ranked:
+            yield self.get_word(ref)
+        yield from self.words_in_key_order(chain.from_iterable(ranges), limit, set(ranked))
+
+    def search_fuzzy(self, word: str, max_distance: int = 1, limit: Optional[int] = None) -> Iterator[Word]:
+        """Iterate over the words whose reading is within max_distance edits of word, closest then most common first"""
+        word = normalize_key(word)
+        self.load()
+        yield from self.top_words(
+            (
+                (ref, priority - distance * priority_levels)
+                for distance, key_id in self.prefix_index.fuzzy(word, max_distance, reading_chars)
+                for ref, priority in self.key_entries(key_id)
+            ),
+            limit,
+        )
+
+    def search_glosses(self, query: str, limit: int) -> Iterator[Word]:
+        """Iterate over the words with a gloss containing every word of the English query, best first"""
+        self.load()
+        if self.gloss_index is None:
+            with self.lock:
+                if self.gloss_index is None:
+                    self.gloss_index = load_cached(
+                        self.cache_filename('glosses'), [self.filename], index_cache_version, self.build_gloss_index,
+                    )
+        for ref in self.gloss_index.search(query, limit):
+            yield self.get_word(ref)
+
+    def search_wildcard(self, pattern: str, limit: Optional[int] = None) -> Iterator[Word]:
+        """Iterate over the words with a key matching pattern, most common first (see words_of_keys)
+
+        In the pattern, '*' stands for any sequence of characters and '?' for
+        any single character (e.g. '*形*' or '食*る')."""
+        literals, operators = split_wildcard(pattern)
+        literals = [normalize_key(literal) if literal else '' for literal in literals]
+        regex = compile_wildcard(literals, operators)
+        self.load()
+        if self.ngram_index is None:
+            with self.lock:
+                if self.ngram_index is None:
+                    self.ngram_index = load_cached(
+                        self.cache_filename('ngrams'), [self.filename], index_cache_version,
+                        lambda: NgramIndex(self.prefix_index),
+                    )
+
+        # only check the keys that contain the rarest gram of the pattern
+        keys = self.prefix_index
+        candidates = self.ngram_index.candidates(literals)
+        if literals[0]:
+            prefixed = self.prefix_index.prefix_range(literals[0])
+            if candidates is None or len(prefixed) < len(candidates):
+                candidates = prefixed
+        if candidates is None:
+            candidates = range(len(keys))
+
+        matches = (key_id for key_id in candidates if regex.fullmatch(keys[key_id]))
+        yield from self.words_of_keys(matches, len(candidates), limit)
 
 
 edict = Edict(default_edict)
-enamdict = Edict(default_enamdict)
+enamdict = Edict(default_enamdict, lazy=True)
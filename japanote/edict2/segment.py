@@ -0,0 +1,61 @@
+import re
+from typing import NamedTuple, Optional
+
+from .deinflect import Deinflector
+from .search import Edict, Word, kana_pair_pattern, normalize_key
+
+# runs of text that may contain Japanese words (kana, kanji and marks such as 'ー' or '々')
+japanese_pattern = re.compile(r'[\u3041-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff々〆]+')
+# how far an inflected form may extend past the stem shared with its dictionary
+# form (e.g. 'させられなかった' in '食べさせられなかった')
+max_inflection_length = 10
+
+
+class Span(NamedTuple):
+    start: int
+    end: int
+    words: list[Word]
+
+
+def segment(text: str, dictionary: Edict, deinflector: Deinflector) -> list[Span]:
+    """Split the Japanese parts of text into the longest dictionary words, inflected or not
+
+    At each position, the longest part of text that is a word (after
+    deinflection) is taken, and the search resumes after it; characters that
+    start no word are skipped. Only the parts that can start a key of the
+    dictionary, plus room for an inflection, are tried. The keys that are
+    prefixes of the text are all found in one walk down the prefix index, so
+    that the other lengths only need their deinflections to be looked up.
+    """
+    dictionary.load()
+    prefix_index = dictionary.prefix_index
+    spans = []
+    for match in japanese_pattern.finditer(text):
+        start, run_end = match.span()
+        while start < run_end:
+            window = text[start:min(run_end, start + max_inflection_length * 2)]
+            normalized = normalize_key(window)
+            prefixes = prefix_index.match(normalized)
+            # normalization may shorten the text (e.g. 'ティ' gives 'ち'), so leave room for it
+            key_length = prefixes.length + len(window) - len(normalized)
+            if len(normalized) == len(window) and not kana_pair_pattern.search(window):
+                # characters were folded one for one, so lengths of keys are lengths of text
+                key_ends: Optional[set[int]] = {start + len(prefix_index[key_id]) for key_id in prefixes.key_ids}
+            else:
+                key_ends = None  # any length up to key_length may be a key
+            for end in range(min(run_end, start + key_length + max_inflection_length), start, -1):
+                if end - start <= key_length and (key_ends is None or end in key_ends):
+                    candidates = deinflector(text[start:end])
+                elif text[end - 1] in deinflector.suffix_to_rules:
+                    # the text itself is not a key, only its deinflections may be
+                    candidates = deinflector(text[start:end])[1:]
+                else:
+                    continue  # not a key, and not inflected either
+                words = dictionary.search_candidates(candidates)
+                if words:
+                    spans.append(Span(start, end, words))
+                    start = end
+                    break
+            else:
+                start += 1
+    return spans
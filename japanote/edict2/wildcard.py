@@ -0,0 +1,60 @@
+import re
+from array import array
+from typing import Iterable, Optional, Sequence
+
+# '*' matches any sequence of characters, '?' matches a single character;
+# the full-width forms are accepted as well since they are what an IME types
+wildcards = {'*': '.*', '＊': '.*', '?': '.', '？': '.'}  # noqa: RUF001 (the full-width forms are intended)
+wildcard_pattern = re.compile(r'([*＊?？])')  # noqa: RUF001 (the full-width forms are intended)
+
+
+def is_wildcard(pattern: str) -> bool:
+    return wildcard_pattern.search(pattern) is not None
+
+
+def split_wildcard(pattern: str) -> tuple[list[str], list[str]]:
+    """Split a pattern into its literal parts and the wildcards between them
+
+    For instance, '食*る' gives (['食', 'る'], ['*']).
+    """
+    parts = wildcard_pattern.split(pattern)
+    return parts[::2], parts[1::2]
+
+
+def compile_wildcard(literals: list[str], operators: list[str]) -> re.Pattern:
+    """Compile the parts returned by split_wildcard() into a regular expression for fullmatch()"""
+    regex = [re.escape(literals[0])]
+    for operator, literal in zip(operators, literals[1:], strict=True):
+        regex.append(wildcards[operator])
+        regex.append(re.escape(literal))
+    return re.compile(''.join(regex), re.DOTALL)
+
+
+class NgramIndex:
+    """Posting lists of the keys containing each character and each pair of consecutive characters
+
+    Keys are referred to by their position in the keys given to the
+    constructor (i.e. their ids in a PrefixIndex).
+    """
+    def __init__(self, keys: Iterable[str]) -> None:
+        postings: dict[str, list[int]] = {}
+        for key_id, key in enumerate(keys):
+            grams = set(key)
+            grams.update(key[i:i + 2] for i in range(len(key) - 1))
+            for gram in grams:
+                postings.setdefault(gram, []).append(key_id)
+        self.postings = {gram: array('I', key_ids) for gram, key_ids in postings.items()}
+
+    def candidates(self, literals: list[str]) -> Optional[Sequence[int]]:
+        """Return the sorted ids of keys that may contain every literal, or None if any key may
+
+        This is the shortest posting list among the grams of the literals, so
+        candidates must still be checked against the pattern."""
+        best: Optional[Sequence[int]] = None
+        for literal in literals:
+            grams = [literal] if len(literal) == 1 else [literal[i:i + 2] for i in range(len(literal) - 1)]
+            for gram in grams:
+                posting = self.postings.get(gram, ())
+                if best is None or len(posting) < len(best):
+                    best = posting
+        return best
@@ -1,19 +1,52 @@
+import threading
+import time
+from functools import cache, partial
 from gettext import ngettext
-from typing import Iterable, Optional
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional, Sequence
 
+from anki.collection import AddNoteRequest, OpChanges
+from anki.decks import DeckId
 from anki.models import NotetypeDict
 from anki.notes import Note
-from aqt import Collection
-from aqt.qt import QAbstractTableModel, Qt
+from aqt import Collection, mw
+from aqt.operations import CollectionOp, QueryOp
+from aqt.qt import QAbstractTableModel, Qt, QWidget, pyqtSignal
 from aqt.utils import showInfo, tooltip
 
-from . import romkan
 from .collection import get_collection
-from .edict2.deinflect import Deinflector
-from .edict2.search import Word, edict, enamdict
+from .edict2.deinflect import Candidate, Deinflector
+from .edict2.furigana import get_kanjidic
+from .edict2.search import Word, edict, enamdict, get_romkan
+from .edict2.segment import segment
+from .edict2.wildcard import is_wildcard
 from .qt import QtCore
 from .settingswindow import SettingsWindow
 
+# maximum number of results listed while typing
+prefix_search_limit = 200
+# patterns starting with this marker are searched in English glosses (e.g. '/shape')
+gloss_search_marker = '/'
+# maximum number of results of a search in English
+gloss_search_limit = 200
+# maximum number of results of a wildcard search (e.g. '*形*')
+wildcard_search_limit = 200
+# maximum number of near misses listed when nothing matches exactly
+fuzzy_search_limit = 200
+# queries at least this long tolerate two typos instead of one
+fuzzy_two_typos_length = 5
+# while a search runs, its results are listed in chunks of this many words, or
+# of the words found in this many seconds when they come slowly
+search_chunk_size = 50
+search_chunk_delay = 0.05
+# look up inflected forms in a precomputed table instead of deinflecting them;
+# this trades about 8 MB of memory per 1000 verbs and adjectives for a few
+# microseconds per search, so it is disabled by default
+use_inflection_index = False
+# when adding at most this many words, search the collection for each of them
+# instead of reading the id field of every note of the note type
+find_notes_max_words = 5
+
 
 def check_field(model: NotetypeDict, config_key: str) -> bool:
     col = get_collection()
@@ -48,12 +81,13 @@ def note_set_field(note: Note, config_key: str, value: str) -> None:
             showInfo(f'Note type "{model["name"]}" has no field "{model_field}"')
 
 
-def add_notes(words: Iterable[Word]) -> None:
+def get_note_target() -> Optional[tuple[DeckId, NotetypeDict]]:
+    """Return the deck and the note type of new notes, or None after telling the user what is wrong"""
     col = get_collection()
     if not col.conf.get('japanote_hasopensettings'):
         showInfo('Please check the settings first')
         SettingsWindow.open()
-        return
+        return None
 
     # select deck
     deck_name = col.conf.get('japanote_deck')
@@ -64,34 +98,79 @@ def add_notes(words: Iterable[Word]) -> None:
     deck = col.decks.get(deck_id)
     if deck is None:
         showInfo('Deck not found')
-        return
+        return None
 
     # select model
     try:
         model_name = col.conf['japanote_model']
     except KeyError:
         showInfo('Note type is not set')
-        return
+        return None
     model = col.models.by_name(model_name)
     if model is None:
         showInfo('Note type not found')
-        return
+        return None
     model['did'] = deck['id']  # update model's default deck
 
     # check fields
     if not check_field(model, 'japanote_kanjiField'):
-        return
+        return None
     if not check_field(model, 'japanote_kanaField'):
-        return
+        return None
     if not check_field(model, 'japanote_furiganaField'):
-        return
+        return None
     if not check_field(model, 'japanote_definitionField'):
-        return
+        return None
     if not check_field(model, 'japanote_idField'):
-        return
+        return None
+    return deck['id'], model
+
 
-    n_newcards = 0
+def existing_ids(col: Collection, model: NotetypeDict, id_field: str) -> Optional[set[str]]:
+    """Return the values of the id field in the notes of the given note type, or None if it has no such field"""
+    try:
+        field_index, _ = col.models.field_map(model)[id_field]
+    except KeyError:
+        return None
+    assert col.db is not None
+    return {
+        fields.split('\x1f')[field_index]
+        for fields in col.db.list('select flds from notes where mid = ?', model['id'])
+    }
+
+
+def find_existing_ids(col: Collection, model: NotetypeDict, id_field: str, ids: Iterable[str]) -> Optional[set[str]]:
+    """Return those of ids found in the id field of notes of the given note type, or None if it has no such field"""
+    if id_field not in col.models.field_names(model):
+        return None
+    return {id_ for id_ in ids if col.find_notes(f'mid:{model["id"]} "{id_field}:{id_}"')}
+
+
+def make_notes(col: Collection, model: NotetypeDict, words: Sequence[Word]) -> tuple[list[Note], list[Word]]:
+    """Create the notes for words, and return them along with the words already in the collection
+
+    A word is already in the collection when a note of the same type has its
+    sequence number in the id field (if the id field is set). A word listed
+    twice is only added once."""
+    id_field = col.conf.get('japanote_idField')
+    ids: Optional[set[str]] = None  # no duplicate check
+    if id_field and len(words) <= find_notes_max_words:
+        ids = find_existing_ids(col, model, id_field, (word.get_sequence_number() for word in words))
+    elif id_field:
+        # load the existing ids once instead of searching the collection for each word
+        ids = existing_ids(col, model, id_field)
+
+    notes = []
+    duplicates = []
     for word in words:
+        # check for duplicates if id field is set
+        if ids is not None:
+            sequence_number = word.get_sequence_number()
+            if sequence_number in ids:
+                duplicates.append(word)
+                continue
+            ids.add(sequence_number)
+
         # create new note
         note = Note(col, model)
         # fill new note
@@ -100,26 +179,111 @@ def add_notes(words: Iterable[Word]) -> None:
         note_set_field(note, 'japanote_furiganaField', word.get_furigana())
         note_set_field(note, 'japanote_definitionField', word.get_meanings_html())
         note_set_field(note, 'japanote_idField', word.get_sequence_number())
+        notes.append(note)
+    return notes, duplicates
 
-        # check for duplicates if id field is set
-        idfield = col.conf.get('japanote_idField')
-        if idfield and col.find_notes(f'{idfield}:{word.get_sequence_number()}'):
-            continue
 
-        # add card
-        n_newcards += col.addNote(note)
+def add_notes(words: Sequence[Word]) -> None:
+    target = get_note_target()
+    if target is None:
+        return
+    deck_id, model = target
 
-    if n_newcards == 0:
+    notes, _ = make_notes(get_collection(), model, words)
+    if not notes:
         showInfo('Note already exists')
-    else:
-        tooltip(ngettext('{} card added.', '{} cards added.', n_newcards).format(n_newcards))
+        return
+
+    # add all the notes in a single operation (undone at once)
+    requests = [AddNoteRequest(note, deck_id) for note in notes]
+    assert mw is not None
+    CollectionOp(mw, lambda col: col.add_notes(requests)).success(
+        lambda _: tooltip(ngettext('{} note added.', '{} notes added.', len(notes)).format(len(notes))),
+    ).run_in_background()
+
+
+class BulkAddReport:
+    """Outcome of bulk_add_notes(), with the patterns of the input sorted by what happened to them"""
+    def __init__(self) -> None:
+        self.changes = OpChanges()  # for CollectionOp
+        self.added: list[str] = []
+        self.duplicates: list[str] = []  # the word already has a note
+        self.ambiguous: list[str] = []  # several words match
+        self.not_found: list[str] = []
+
+    def summary(self) -> str:
+        lines = [
+            ngettext('{} note added.', '{} notes added.', len(self.added)).format(len(self.added)),
+        ]
+        for label, patterns in [
+            ('Already in the collection', self.duplicates),
+            ('Several words match (use the search window)', self.ambiguous),
+            ('Not found', self.not_found),
+        ]:
+            if patterns:
+                lines.append(f'{label} ({len(patterns)}): {"、".join(patterns)}')
+        return '\n\n'.join(lines)
+
+
+def bulk_add_notes(parent: QWidget, patterns: Iterable[str], on_done: Callable[[BulkAddReport], None]) -> bool:
+    """Add a note for each pattern (one per word of a vocabulary list) in the background
+
+    Patterns that match several words, or none, are skipped. Notes are added
+    in a single operation, so that they can be undone at once. Return whether
+    the operation was started (the settings may not be usable)."""
+    target = get_note_target()
+    if target is None:
+        return False
+    deck_id, model = target
+    patterns = [pattern.strip() for pattern in patterns]
+
+    def op(col: Collection) -> BulkAddReport:
+        report = BulkAddReport()
+        # resolve the patterns
+        resolved: dict[str, tuple[str, Word]] = {}  # by sequence number
+        for pattern in patterns:
+            if not pattern:
+                continue
+            words, is_fuzzy = find_words(pattern, is_proper_noun=False)
+            if not words or is_fuzzy:
+                report.not_found.append(pattern)
+            elif len(words) > 1:
+                report.ambiguous.append(pattern)
+            elif words[0].get_sequence_number() in resolved:
+                report.duplicates.append(pattern)  # listed twice
+            else:
+                resolved[words[0].get_sequence_number()] = (pattern, words[0])
+
+        # add the notes
+        notes, duplicates = make_notes(col, model, [word for _, word in resolved.values()])
+        duplicate_numbers = {word.get_sequence_number() for word in duplicates}
+        for sequence_number, (pattern, _) in resolved.items():
+            if sequence_number in duplicate_numbers:
+                report.duplicates.append(pattern)
+            else:
+                report.added.append(pattern)
+        if notes:
+            report.changes = col.add_notes([AddNoteRequest(note, deck_id) for note in notes])
+        return report
+
+    CollectionOp(parent, op).success(on_done).run_in_background()
+    return True
 
 
 class WordSearchModel(QAbstractTableModel):
+    # emitted with True when a search starts, and with False when its results are listed
+    busy = pyqtSignal(bool)
+
     def __init__(self) -> None:
         QAbstractTableModel.__init__(self)
         self.words: list[Word] = []
+        # values of the columns of each row, computed on first display; parallel to words
+        self.rows: list[Optional[tuple[str, ...]]] = []
         self.is_proper_noun = False
+        self.is_fuzzy = False  # whether words are near misses rather than matches
+        # incremented by each search, so that the results of older ones are discarded
+        self.generation = 0
+        self.listed_generation = 0  # search whose results are listed
 
     def rowCount(self, parent: QtCore.QModelIndex = ...) -> int:
         return len(self.words)
@@ -142,24 +306,27 @@ class WordSearchModel(QAbstractTableModel):
         if not index.isValid():
             return None
         if role == Qt.ItemDataRole.DisplayRole:
-            row: int = index.row()
-            word = self.words[row]
-            column = index.column()
-            if column == 0:
-                return word.kanji
-            elif column == 1:
-                return word.kana
-            elif column == 2:
-                return word.get_furigana()
-            elif column == 3:
-                return word.get_sequence_number()
-            elif column == 4:
-                return '\n'.join(word.get_meanings())
-            else:
-                raise NotImplementedError
+            return self.row_values(index.row())[index.column()]
         else:
             return None
 
+    def row_values(self, row: int) -> tuple[str, ...]:
+        """Return the values of the columns of a row, computing them on first use
+
+        Qt calls data() on every paint, so glosses are only parsed once per row."""
+        values = self.rows[row]
+        if values is None:
+            word = self.words[row]
+            values = (
+                word.kanji,
+                word.kana,
+                word.get_furigana(),
+                word.get_sequence_number(),
+                '\n'.join(word.get_meanings()),
+            )
+            self.rows[row] = values
+        return values
+
     def sort(self, column: int, order: Qt.SortOrder = QtCore.Qt.SortOrder.DescendingOrder) -> None:
         reverse = order == QtCore.Qt.SortOrder.DescendingOrder
         if column == 0:
@@ -169,22 +336,198 @@ class WordSearchModel(QAbstractTableModel):
         else:
             return
         self.modelAboutToBeReset.emit()
-        self.words = sorted(self.words, key=key, reverse=reverse)
+        # keep the values already computed along with their word
+        indices = sorted(range(len(self.words)), key=lambda i: key(self.words[i]), reverse=reverse)
+        self.words = [self.words[i] for i in indices]
+        self.rows = [self.rows[i] for i in indices]
         self.modelReset.emit()
 
-    def search(self, word: str) -> None:
-        word = romkan.to_hiragana(word)
-        self.modelAboutToBeReset.emit()
-        if self.is_proper_noun:
-            self.words = list(enamdict.search(word))
-        else:
-            self.words = []
-            for candidate in set(deinflector(word)):
-                for word2 in edict.search(candidate.word):
-                    if word2.get_type() & candidate.type_:
-                        self.words.append(word2)
-        self.modelReset.emit()
+    def search(self, word: str, prefix: bool = False, on_done: Optional[Callable[[], None]] = None) -> None:
+        """Search for word; with prefix, also list words starting with it (search-as-you-type)
+
+        The search runs in a background thread; on_done is called once its
+        results are listed, unless another search was started meanwhile."""
+        is_proper_noun = self.is_proper_noun
+        self.run_search(lambda: iter_words(word, is_proper_noun, prefix), on_done)
+
+    def search_text(self, text: str, on_done: Optional[Callable[[], None]] = None) -> None:
+        """List the words of a sentence or a paragraph, in order of appearance (in the background)"""
+        self.run_search(lambda: ((word, False) for word in find_text_words(text)), on_done)
+
+    def run_search(
+        self, find: Callable[[], Iterator[tuple[Word, bool]]], on_done: Optional[Callable[[], None]],
+    ) -> None:
+        """Consume find in a background thread, listing its words in chunks until another search is started
+
+        The first chunk replaces the rows of the previous search, and the
+        next ones are appended to them."""
+        assert mw is not None
+        taskman = mw.taskman
+        self.generation += 1
+        generation = self.generation
+        self.busy.emit(True)
+
+        def op(_col: Collection) -> Optional[list[tuple[Word, bool]]]:
+            chunk: list[tuple[Word, bool]] = []
+            last_post = time.monotonic()
+            for result in find():
+                if generation != self.generation:
+                    return None  # superseded, e.g. by the next key typed
+                chunk.append(result)
+                if len(chunk) >= search_chunk_size or time.monotonic() - last_post >= search_chunk_delay:
+                    taskman.run_on_main(partial(self.add_rows, generation, chunk))
+                    chunk = []
+                    last_post = time.monotonic()
+            return chunk
+
+        def success(chunk: Optional[list[tuple[Word, bool]]]) -> None:
+            if generation != self.generation or chunk is None:
+                return
+            self.add_rows(generation, chunk)
+            self.busy.emit(False)
+            if on_done is not None:
+                on_done()
+
+        def failure(error: Exception) -> None:
+            if generation != self.generation:
+                return
+            self.busy.emit(False)
+            showInfo(f'JapaNote: search failed: {error}')
+
+        QueryOp(parent=mw, op=op, success=success).failure(failure).without_collection().run_in_background()
+
+    def add_rows(self, generation: int, chunk: list[tuple[Word, bool]]) -> None:
+        """List a chunk of the results of a search (on the main thread)"""
+        if generation != self.generation:
+            return  # results of a superseded search
+        if self.listed_generation != generation:
+            # first chunk of a new search
+            self.modelAboutToBeReset.emit()
+            self.words = [word for word, _ in chunk]
+            self.rows = [None] * len(self.words)
+            self.is_fuzzy = any(is_near_miss for _, is_near_miss in chunk)
+            self.listed_generation = generation
+            self.modelReset.emit()
+        elif chunk:
+            start = len(self.words)
+            self.beginInsertRows(QtCore.QModelIndex(), start, start + len(chunk) - 1)
+            self.words.extend(word for word, _ in chunk)
+            self.rows.extend([None] * len(chunk))
+            self.is_fuzzy = self.is_fuzzy or any(is_near_miss for _, is_near_miss in chunk)
+            self.endInsertRows()
+
+
+def find_words(pattern: str, is_proper_noun: bool, prefix: bool = False) -> tuple[list[Word], bool]:
+    """Return the words matching pattern, and whether they are only near misses"""
+    results = list(iter_words(pattern, is_proper_noun, prefix))
+    return [word for word, _ in results], any(is_near_miss for _, is_near_miss in results)
+
+
+def iter_words(pattern: str, is_proper_noun: bool, prefix: bool = False) -> Iterator[tuple[Word, bool]]:
+    """Iterate over the words matching pattern, each with whether it is only a near miss
+
+    A pattern starting with gloss_search_marker is looked up in the English
+    glosses. So is an ASCII pattern that does not match any reading. A pattern
+    with wildcards ('*' or '?') is matched against writings and readings.
+    Words are produced as the dictionary finds them, so that they can be
+    listed before the search ends."""
+    if not pattern.strip():
+        return  # not even a near miss (every one-kana key is one typo away)
+    dictionary = enamdict if is_proper_noun else edict
+    if pattern.startswith(gloss_search_marker):
+        for word in dictionary.search_glosses(pattern[len(gloss_search_marker):], gloss_search_limit):
+            yield word, False
+        return
+    if is_wildcard(pattern):
+        for word in dictionary.search_wildcard(pattern, wildcard_search_limit):
+            yield word, False
+        return
+
+    reading = get_romkan().to_hiragana(pattern)
+    if is_proper_noun:
+        words = list(enamdict.search(reading))
+    else:
+        words = edict.search_candidates(deinflect(reading))
+    for word in words:
+        yield word, False
+
+    if prefix:
+        # exact matches first, then completions
+        completions = (word for word in dictionary.search_prefix(pattern, prefix_search_limit) if word not in words)
+        for word in islice(completions, max(0, prefix_search_limit - len(words))):
+            yield word, False
+        return
+    if words:
+        return
+    if pattern.isascii():
+        # not a reading in romaji; maybe English (e.g. 'shape')
+        found = False
+        for word in dictionary.search_glosses(pattern, gloss_search_limit):
+            found = True
+            yield word, False
+        if found:
+            return
+    # look for near misses (e.g. a missing long vowel or a small kana typed as a large one)
+    max_distance = 2 if len(reading) >= fuzzy_two_typos_length else 1
+    for word in dictionary.search_fuzzy(reading, max_distance, fuzzy_search_limit):
+        yield word, True
+
+
+def find_text_words(text: str) -> list[Word]:
+    """Return the words of a sentence or a paragraph, in order of appearance"""
+    words: dict[Word, None] = {}  # ordered set
+    for span in segment(text, edict, get_deinflector()):
+        words.update(dict.fromkeys(span.words))
+    return list(words)
+
+
+deinflector_lock = threading.Lock()
+
+
+@cache
+def load_deinflector() -> Deinflector:
+    return Deinflector()
+
+
+def get_deinflector() -> Deinflector:
+    """Return the deinflector, waiting for the end of any load running in another thread"""
+    # cache() does not keep two threads from loading it at the same time
+    with deinflector_lock:
+        return load_deinflector()
+
+
+def deinflect(word: str) -> tuple[Candidate, ...]:
+    """Return the possible deinflections of word (including word)"""
+    if use_inflection_index:
+        candidates = edict.load_inflection_index(get_deinflector()).get(word)
+        if candidates is not None:
+            return (Candidate(word, 0xff), *candidates)
+        # not an inflected form of a known word, or inflected more than the index covers
+    return get_deinflector()(word)
+
+
+# set once preload() has loaded everything searches need
+dictionaries_ready = threading.Event()
+
+
+def preload() -> None:
+    """Load dictionaries ahead of the first search (meant to run in a background thread)
+
+    dictionaries_ready is set even on failure, so that searches stop waiting
+    for the preload and load what they need (reporting the error) themselves."""
+    try:
+        edict.load()
+        enamdict.load()
+        get_kanjidic()
+        get_deinflector()
+        get_romkan()  # compiles its regular expressions
+        if use_inflection_index:
+            edict.load_inflection_index(get_deinflector())
+    finally:
+        dictionaries_ready.set()
 
 
-deinflector = Deinflector()
-word_search = WordSearchModel()
+@cache
+def get_word_search() -> WordSearchModel:
+    """Return the model of the search results, shared by the quick add form and the search window"""
+    return WordSearchModel()
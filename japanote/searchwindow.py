@@ -1,14 +1,17 @@
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 from aqt import mw
-from aqt.qt import QMainWindow, Qt
+from aqt.qt import QAbstractItemView, QItemSelectionModel, QMainWindow, Qt
 
 from .collection import get_collection
-from .model import add_notes, word_search
-from .qt import QtGui, searchwindow
+from .model import add_notes, get_word_search
+from .qt import QtCore, QtGui, searchwindow
 from .settingswindow import SettingsWindow
 from .view import window_to_front
 
+if TYPE_CHECKING:
+    from .edict2.search import Word
+
 
 class SearchWindow(QMainWindow):
     instance = None
@@ -22,11 +25,19 @@ class SearchWindow(QMainWindow):
 
     def closeEvent(self, evt: QtGui.QCloseEvent) -> None:
         type(self).instance = None
+        word_search = get_word_search()
+        word_search.busy.disconnect(self.form.busyBar.setVisible)
+        word_search.modelAboutToBeReset.disconnect(self.save_view)
+        word_search.modelReset.disconnect(self.restore_view)
+        word_search.rowsInserted.disconnect(self.restore_view)
         self.hide()
         evt.accept()
 
     def __init__(self, pattern: Optional[str] = None) -> None:
         QMainWindow.__init__(self)
+        # selected words and first visible word, looked for in the results of the next search
+        self.kept_selection: set[Word] = set()
+        self.kept_top: Optional[Word] = None
 
         if pattern is None:
             col = get_collection()
@@ -35,13 +46,21 @@ class SearchWindow(QMainWindow):
         self.form = searchwindow.Ui_MainWindow()
         self.form.setupUi(self)  # type: ignore[no-untyped-call]
         self.form.pattern.setText(pattern)
-        self.form.resultTable.setModel(word_search)
+        self.form.resultTable.setModel(get_word_search())
+        self.form.busyBar.hide()
 
         # events
+        self.form.pattern.textEdited.connect(self.update_live_search)
         self.form.pattern.returnPressed.connect(self.update_search)
         self.form.searchButton.clicked.connect(self.update_search)
+        self.form.splitBox.toggled.connect(self.update_search)
         self.form.addButton.clicked.connect(self.on_add_notes)
         self.form.settingsButton.clicked.connect(SettingsWindow.open)
+        word_search = get_word_search()
+        word_search.busy.connect(self.form.busyBar.setVisible)
+        word_search.modelAboutToBeReset.connect(self.save_view)
+        word_search.modelReset.connect(self.restore_view)
+        word_search.rowsInserted.connect(self.restore_view)
 
         self.update_search()
 
@@ -53,17 +72,55 @@ class SearchWindow(QMainWindow):
         if event.key() == Qt.Key.Key_Escape:
             self.close()
 
+    def save_view(self) -> None:
+        """Remember the selected words and the first visible one, before the results are replaced"""
+        word_search = get_word_search()
+        table = self.form.resultTable
+        self.kept_selection = {word_search.words[index.row()] for index in table.selectionModel().selectedRows()}
+        top = table.rowAt(0)
+        self.kept_top = word_search.words[top] if top >= 0 else None
+
+    def restore_view(self, _parent: Optional[QtCore.QModelIndex] = None, first: int = 0, last: int = -1) -> None:
+        """Select the remembered words and scroll back to the first visible one, among the rows listed so far
+
+        Results are listed in chunks, so this is done again for each chunk (the
+        arguments are those of rowsInserted, the parent being always the root)."""
+        word_search = get_word_search()
+        table = self.form.resultTable
+        if last < 0:
+            last = len(word_search.words) - 1  # after a reset
+        flags = QItemSelectionModel.SelectionFlag.Select | QItemSelectionModel.SelectionFlag.Rows
+        for row in range(first, last + 1):
+            word = word_search.words[row]
+            if word in self.kept_selection:
+                table.selectionModel().select(word_search.index(row, 0), flags)
+            if word == self.kept_top:
+                table.scrollTo(word_search.index(row, 0), QAbstractItemView.ScrollHint.PositionAtTop)
+                self.kept_top = None
+
     def update_search(self) -> None:
         # get settings
         pattern = self.form.pattern.text()
         # update results
-        word_search.search(pattern)
+        if self.form.splitBox.isChecked():
+            get_word_search().search_text(pattern)
+        else:
+            get_word_search().search(pattern)
         # save settings for persistence
         col = get_collection()
         col.conf['japanote_pattern'] = pattern
 
+    def update_live_search(self) -> None:
+        # an empty pattern finds no words, which clears the results
+        pattern = self.form.pattern.text().strip()
+        if self.form.splitBox.isChecked():
+            get_word_search().search_text(pattern)
+        else:
+            get_word_search().search(pattern, prefix=True)
+
     def on_add_notes(self) -> None:
         rows = self.form.resultTable.selectionModel().selectedRows()
+        word_search = get_word_search()
         words = [
             word_search.words[index.row()]
             for index in rows